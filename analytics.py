@@ -0,0 +1,64 @@
+import io
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+import streamlit as st
+import transaction_store
+
+# Imported only when the Analytics page is opened, so the plotting stack
+# stays out of the app's startup path.
+
+GRANULARITIES = {
+    "Daily": "rollup_daily",
+    "Weekly": "rollup_daily",
+    "Monthly": "rollup_monthly",
+}
+METRICS = {
+    "Consumption": "Quantity Out",
+    "Purchases": "Quantity In",
+    "Purchase Spend": "Spend",
+    "Consumption Cost": "Usage Cost",
+}
+
+
+def load_series(store_path, product_id, granularity):
+    """Return the rollup for one product (or all products) at the given granularity, indexed by period."""
+    rollup = transaction_store.load_rollup(store_path, GRANULARITIES[granularity], product_id)
+    values = rollup.drop(columns=["Product ID"]).groupby("Period").sum()
+    if granularity == "Monthly":
+        values.index = pd.PeriodIndex(values.index, freq="M").to_timestamp()
+    else:
+        values.index = pd.to_datetime(values.index)
+    if granularity == "Weekly":
+        values = values.resample("W-MON", label="left", closed="left").sum()
+    return values
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def render_chart(store_path, product_id, granularity, metric, title, version):
+    """Render a chart to PNG bytes; version (the store version) keys the cache so new data re-renders."""
+    values = load_series(store_path, product_id, granularity)
+    column = METRICS[metric]
+    fig, ax = plt.subplots(figsize=(10, 4))
+    if not values.empty:
+        sns.barplot(x=values.index.strftime("%Y-%m-%d" if granularity != "Monthly" else "%b %Y"), y=values[column].values, ax=ax, color="#c0392b")
+        ax.tick_params(axis="x", rotation=60)
+        if len(values) > 30:
+            for i, label in enumerate(ax.get_xticklabels()):
+                label.set_visible(i % max(len(values) // 30, 1) == 0)
+    ax.set_title(title)
+    ax.set_xlabel(granularity)
+    ax.set_ylabel(metric)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def summary_table(store_path, product_id, granularity, version):
+    """Return the rollup table shown under the chart."""
+    return load_series(store_path, product_id, granularity)
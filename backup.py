@@ -0,0 +1,310 @@
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+import transaction_store
+from instrumentation import timed
+
+# A write takes a new snapshot only once this long has passed since the last one;
+# snapshots older than the retention period are deleted (the newest is always kept)
+DEFAULT_SNAPSHOT_INTERVAL = timedelta(hours=1)
+DEFAULT_RETENTION = timedelta(days=30)
+SNAPSHOT_FORMAT = "%Y%m%d-%H%M%S"
+# A snapshot records a transaction store as <store>.rows, holding its last backed-up row id
+ROWS_SUFFIX = ".rows"
+
+# Per source file: (mtime, size, sha256) as of the last backup; per store: its last backed-up row id
+_last_backup = {}
+_pending = None
+_pending_lock = threading.Lock()
+_wake = threading.Event()
+_worker = None
+
+
+def _file_hash(file_path):
+    """Return the SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy(src_file, dest_file):
+    """Copy one file; SQLite stores go through the online backup API so the copy is consistent."""
+    if src_file.endswith(".db"):
+        source = sqlite3.connect(src_file)
+        destination = sqlite3.connect(dest_file)
+        try:
+            source.backup(destination)
+        finally:
+            destination.close()
+            source.close()
+    else:
+        shutil.copy(src_file, dest_file)
+
+
+def changed_files(file_paths, reference_folder=None):
+    """Return the files whose content differs from their last backup, with their new state.
+
+    After a restart there is no record of the last backup, so the copy in
+    reference_folder (a mirror) is hashed instead.
+    """
+    changed = []
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            continue
+        stat = os.stat(file_path)
+        last = _last_backup.get(file_path)
+        if last is not None and last[:2] == (stat.st_mtime_ns, stat.st_size):
+            continue  # Untouched since the last backup
+        file_hash = _file_hash(file_path)
+        if last is None and reference_folder:
+            mirror_file = os.path.join(reference_folder, os.path.basename(file_path))
+            if os.path.exists(mirror_file):
+                last = (None, None, _file_hash(mirror_file))
+        if last is not None and last[2] == file_hash:
+            _last_backup[file_path] = (stat.st_mtime_ns, stat.st_size, file_hash)
+            continue  # Rewritten with identical content
+        changed.append((file_path, (stat.st_mtime_ns, stat.st_size, file_hash)))
+    return changed
+
+
+@timed()
+def run_backup(file_paths, mirror_folders, snapshot_folder=None, retention=DEFAULT_RETENTION, append_only=(),
+               snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+    """Copy changed files to every mirror folder, and into a new timestamped snapshot if one is due.
+
+    The mirrors always hold the latest state; snapshots are restore points
+    taken at most once per snapshot_interval and kept for retention. Files in append_only are transaction stores: their mirrors are extended
+    with the new rows only, and a snapshot records the store's last row
+    instead of holding a copy.
+    """
+    append_only = [file_path for file_path in append_only if file_path in file_paths] if mirror_folders else []
+    regular = [file_path for file_path in file_paths if file_path not in append_only]
+    changed = changed_files(regular, mirror_folders[0] if mirror_folders else None)
+    stores = changed_stores(append_only, mirror_folders[0] if mirror_folders else None)
+    if not changed and not stores:
+        return []
+
+    for folder in mirror_folders:
+        os.makedirs(folder, exist_ok=True)
+    for file_path, state in changed:
+        for folder in mirror_folders:
+            _copy(file_path, os.path.join(folder, os.path.basename(file_path)))
+        _last_backup[file_path] = state
+        print(f"Backed up {os.path.basename(file_path)}.")
+    for store_path in stores:
+        for folder in mirror_folders:
+            _last_backup[store_path] = transaction_store.update_copy(store_path, os.path.join(folder, os.path.basename(store_path)))
+        print(f"Backed up {os.path.basename(store_path)}.")
+
+    if snapshot_folder and snapshot_due(snapshot_folder, snapshot_interval):
+        write_snapshot(snapshot_folder, regular, append_only)
+        prune_snapshots(snapshot_folder, retention)
+    return [file_path for file_path, _ in changed] + stores
+
+
+def changed_stores(store_paths, reference_folder=None):
+    """Return the transaction stores with rows that are not backed up yet.
+
+    After a restart the last row of the copy in reference_folder is used.
+    """
+    changed = []
+    for store_path in store_paths:
+        if not os.path.exists(store_path):
+            continue
+        last = _last_backup.get(store_path)
+        if last is None and reference_folder:
+            mirror_store = os.path.join(reference_folder, os.path.basename(store_path))
+            if os.path.exists(mirror_store):
+                last = _last_backup[store_path] = transaction_store.last_row_id(mirror_store)
+        if last != transaction_store.last_row_id(store_path):
+            changed.append(store_path)
+    return changed
+
+
+def _snapshot_time(name):
+    """Return when a snapshot was taken, or None for a folder that isn't a snapshot."""
+    try:
+        return datetime.strptime(name, SNAPSHOT_FORMAT)
+    except ValueError:
+        return None
+
+
+def snapshot_due(snapshot_folder, interval):
+    """Check if interval has passed since the latest snapshot."""
+    taken = [_snapshot_time(name) for name in list_snapshots(snapshot_folder)]
+    taken = [time for time in taken if time is not None]
+    return not taken or datetime.now() - taken[-1] >= interval
+
+
+def _same_file(file_path, snapshot_file):
+    """Check if a snapshot copy (written with the source's mtime) is still current."""
+    if not snapshot_file or not os.path.exists(snapshot_file):
+        return False
+    source, copy = os.stat(file_path), os.stat(snapshot_file)
+    return (source.st_mtime_ns, source.st_size) == (copy.st_mtime_ns, copy.st_size)
+
+
+def write_snapshot(snapshot_folder, file_paths, store_paths):
+    """Write a complete snapshot: hard links to the previous snapshot's copies of unchanged files, new copies of the rest.
+
+    Every snapshot holds every file, so pruning old snapshots never loses
+    the only copy of a file that rarely changes. Copies keep the source's
+    mtime, which is how the next snapshot tells that a file is unchanged.
+    Stores get a small <store>.rows file with the last backed-up row
+    instead of a copy.
+    """
+    name = datetime.now().strftime(SNAPSHOT_FORMAT)
+    snapshot_dir = os.path.join(snapshot_folder, name)
+    earlier = [snapshot for snapshot in list_snapshots(snapshot_folder) if snapshot != name]
+    previous_dir = os.path.join(snapshot_folder, earlier[-1]) if earlier else None
+    os.makedirs(snapshot_dir, exist_ok=True)
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            continue
+        file_name = os.path.basename(file_path)
+        dest_file = os.path.join(snapshot_dir, file_name)
+        previous_file = previous_dir and os.path.join(previous_dir, file_name)
+        if os.path.exists(dest_file):
+            os.remove(dest_file)  # Same second as the last snapshot; it may be a link shared with older ones
+        if _same_file(file_path, previous_file):
+            try:
+                os.link(previous_file, dest_file)
+                continue
+            except OSError:
+                pass  # No hard links on this drive
+        stat = os.stat(file_path)  # Before copying: a change made during the copy gets copied next time
+        _copy(file_path, dest_file)
+        os.utime(dest_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    for store_path in store_paths:
+        if store_path in _last_backup:
+            with open(os.path.join(snapshot_dir, os.path.basename(store_path) + ROWS_SUFFIX), "w") as f:
+                f.write(str(_last_backup[store_path]))
+    return snapshot_dir
+
+
+def list_snapshots(snapshot_folder):
+    """Return snapshot names, oldest first."""
+    if not os.path.exists(snapshot_folder):
+        return []
+    return sorted(
+        name for name in os.listdir(snapshot_folder)
+        if os.path.isdir(os.path.join(snapshot_folder, name))
+    )
+
+
+def prune_snapshots(snapshot_folder, retention):
+    """Delete the snapshots older than retention, always keeping the newest one."""
+    cutoff = datetime.now() - retention
+    for name in list_snapshots(snapshot_folder)[:-1]:
+        taken = _snapshot_time(name)
+        if taken is not None and taken < cutoff:
+            shutil.rmtree(os.path.join(snapshot_folder, name))
+
+
+def restore_snapshot(snapshot_folder, snapshot_name, file_paths, mirror_folder):
+    """Restore the data files (given by their paths) to a snapshot; returns the restored file names.
+
+    Each file is taken from the latest snapshot at or before snapshot_name
+    that has it (snapshots made before they were complete only hold the
+    files that changed). A transaction store is rebuilt from its mirror
+    copy, cut back to the snapshot's last row.
+    """
+    if snapshot_name not in list_snapshots(snapshot_folder):
+        raise ValueError(f"No snapshot named {snapshot_name} in {snapshot_folder}")
+    targets = {os.path.basename(file_path): file_path for file_path in file_paths}
+    sources = {}
+    for name in list_snapshots(snapshot_folder):
+        if name > snapshot_name:
+            break
+        snapshot_dir = os.path.join(snapshot_folder, name)
+        for file_name in os.listdir(snapshot_dir):
+            if file_name.endswith(ROWS_SUFFIX):
+                file_name = file_name[:-len(ROWS_SUFFIX)]
+                sources[file_name] = ("rows", os.path.join(snapshot_dir, file_name + ROWS_SUFFIX))
+            else:
+                sources[file_name] = ("copy", os.path.join(snapshot_dir, file_name))
+    restored = []
+    for file_name, (kind, src_file) in sorted(sources.items()):
+        if file_name not in targets:
+            continue
+        if kind == "copy":
+            _copy(src_file, targets[file_name])
+        else:
+            with open(src_file) as f:
+                last_row_id = int(f.read())
+            # Cut a copy of the mirror back to the snapshot, then copy it over the store
+            temp_path = os.path.splitext(targets[file_name])[0] + ".restoring.db"
+            try:
+                _copy(os.path.join(mirror_folder, file_name), temp_path)
+                transaction_store.truncate_copy(temp_path, last_row_id)
+                _copy(temp_path, targets[file_name])
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        restored.append(file_name)
+    _last_backup.clear()
+    return restored
+
+
+def _backup_worker():
+    """Run queued backups one at a time on a background thread."""
+    global _pending
+    while True:
+        _wake.wait()
+        with _pending_lock:
+            job = _pending
+            _pending = None
+            _wake.clear()
+        if job is None:
+            continue
+        try:
+            run_backup(*job)
+        except Exception as e:
+            print(f"Backup failed: {e}")
+
+
+def request_backup(file_paths, mirror_folders, snapshot_folder=None, retention=DEFAULT_RETENTION, append_only=(),
+                   snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+    """Queue a backup on the background thread and return immediately.
+
+    Requests made while a backup is running are coalesced into one.
+    """
+    global _pending, _worker
+    with _pending_lock:
+        _pending = (list(file_paths), list(mirror_folders), snapshot_folder, retention, list(append_only), snapshot_interval)
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_backup_worker, name="inventory-backup", daemon=True)
+            _worker.start()
+    _wake.set()
+
+
+def main():
+    # Imported here: inventory_core itself imports this module
+    import inventory_core
+    parser = argparse.ArgumentParser(description="Inventory snapshot tools")
+    parser.add_argument("--data-dir", help="Data folder (default: the configured one)")
+    parser.add_argument("--branch", help="Branch (default: the configured one)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List the snapshots, oldest first")
+    restore_parser = subparsers.add_parser("restore", help="Restore the data files to a snapshot")
+    restore_parser.add_argument("snapshot", help="Snapshot name, as printed by list")
+    args = parser.parse_args()
+    inventory_core.configure(args.data_dir, args.branch)
+    if args.command == "list":
+        for name in list_snapshots(inventory_core.snapshot_folder):
+            print(name)
+    elif args.command == "restore":
+        with inventory_core.all_locked():
+            restored = restore_snapshot(inventory_core.snapshot_folder, args.snapshot,
+                                        inventory_core.files_to_copy(), inventory_core.backup_folder)
+        print(f"Restored {', '.join(restored) or 'nothing'} from snapshot {args.snapshot}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import pandas as pd
+from product_index import normalize_name, product_details_index
+
+# Columns of an uploaded or hand-entered batch. "Product" holds a name or an ID.
+BATCH_COLUMNS = ["Product", "Quantity", "Total Cost", "Date"]
+# Optional batch column, checked and passed through when present
+EXPIRY_COLUMN = "Expiry Date"
+
+
+def empty_batch():
+    """Return an empty batch grid."""
+    return pd.DataFrame({
+        "Product": pd.Series(dtype=str),
+        "Quantity": pd.Series(dtype=float),
+        "Total Cost": pd.Series(dtype=float),
+        "Date": pd.Series(dtype="datetime64[ns]"),
+        EXPIRY_COLUMN: pd.Series(dtype="datetime64[ns]"),
+    })
+
+
+def read_batch_file(uploaded_file, usage=False):
+    """Read a CSV or Excel batch upload into the batch layout (with Expiry Date if the file has it).
+
+    Usage rows are costed automatically, so a usage file needs no Total Cost.
+    """
+    if uploaded_file.name.lower().endswith(".csv"):
+        batch = pd.read_csv(uploaded_file)
+    else:
+        batch = pd.read_excel(uploaded_file)
+    required = [column for column in BATCH_COLUMNS if not (usage and column == "Total Cost")]
+    missing = [column for column in required if column not in batch.columns]
+    if missing:
+        raise ValueError(f"Batch file is missing columns: {', '.join(missing)}")
+    columns = BATCH_COLUMNS + ([EXPIRY_COLUMN] if EXPIRY_COLUMN in batch.columns else [])
+    return batch.reindex(columns=columns)  # A usage file without Total Cost gets an empty column
+
+
+def _flag(errors, condition, message):
+    """Record message on rows matching condition that have no earlier error."""
+    return errors.mask(condition.fillna(True) & (errors == ""), message)
+
+
+def _by_product_id(master_data, column):
+    """Return master_data[column] as a Series indexed by Product ID (first row wins)."""
+    ids = pd.to_numeric(master_data["Product ID"], errors="coerce")
+    values = pd.to_numeric(master_data[column], errors="coerce")
+    return pd.Series(values.values, index=ids.values).groupby(level=0).first()
+
+
+def _fifo_costs(ledger, product_id, quantity):
+    """Cost each usage row at FIFO, with earlier rows of the same product drawing first."""
+    used = {}
+    costs = []
+    for pid, qty in zip(product_id, quantity):
+        if pd.isna(pid) or pd.isna(qty):
+            costs.append(float("nan"))
+            continue
+        costs.append(ledger.peek_cost(pid, qty, used.get(pid, 0)))
+        used[pid] = used.get(pid, 0) + qty
+    return pd.Series(costs, index=quantity.index)
+
+
+def validate_batch(batch, product_details, master_data, usage=False, ledger=None):
+    """Validate every batch row at once.
+
+    Returns (transactions, rejected): the valid rows in the inventory catalog
+    layout (usage quantities negated and costed at the average price, or at
+    FIFO lot cost when a lot ledger is given, as in handle_factory_usage), and
+    the invalid rows with an "Error" column. An optional Expiry Date column
+    is checked too and kept on the valid rows.
+    """
+    batch = batch.dropna(how="all").reset_index(drop=True)
+    errors = pd.Series("", index=batch.index, dtype=object)
+
+    # Resolve each product by ID first, then by name
+    index = product_details_index(product_details)
+    as_id = pd.to_numeric(batch["Product"], errors="coerce")
+    by_id = as_id.where(as_id.isin(list(index.id_to_pos)))
+    by_name = batch["Product"].map(lambda name: index.name_to_id.get(normalize_name(name)) if pd.notna(name) else None)
+    product_id = by_id.fillna(pd.to_numeric(by_name, errors="coerce"))
+    errors = _flag(errors, product_id.isna(), "Unknown product")
+
+    quantity = pd.to_numeric(batch["Quantity"], errors="coerce")
+    errors = _flag(errors, ~(quantity > 0), "Quantity must be greater than zero")
+    date = pd.to_datetime(batch["Date"], errors="coerce")
+    errors = _flag(errors, date.isna(), "Invalid date")
+    if EXPIRY_COLUMN in batch.columns:
+        expiry_date = pd.to_datetime(batch[EXPIRY_COLUMN], errors="coerce")
+        given = batch[EXPIRY_COLUMN].notna() & (batch[EXPIRY_COLUMN].astype(str).str.strip() != "")
+        errors = _flag(errors, given & expiry_date.isna(), "Invalid expiry date")
+
+    if usage:
+        # Running usage per product must stay within the stock held before the batch
+        stock = product_id.map(_by_product_id(master_data, "Total Quantity")).fillna(0)
+        running = quantity.where(errors == "", 0).groupby(product_id).cumsum()
+        errors = _flag(errors, running > stock, "Insufficient quantity in stock")
+        if ledger is None:
+            avg_price = product_id.map(_by_product_id(master_data, "Average Price")).fillna(0)
+            total_cost = quantity * avg_price
+        else:
+            total_cost = _fifo_costs(ledger, product_id, quantity.where(errors == ""))
+        quantity = -quantity
+    else:
+        total_cost = pd.to_numeric(batch["Total Cost"], errors="coerce")
+        errors = _flag(errors, ~(total_cost > 0), "Total Cost must be greater than zero")
+
+    valid = errors == ""
+    transactions = pd.DataFrame({
+        "Product ID": product_id[valid].astype(int),
+        "Quantity Added": quantity[valid],
+        "Total Cost": total_cost[valid],
+        "Purchase Date": date[valid],
+    }).reset_index(drop=True)
+    if EXPIRY_COLUMN in batch.columns:
+        transactions[EXPIRY_COLUMN] = expiry_date[valid].reset_index(drop=True)
+    rejected = batch[~valid].assign(Error=errors[~valid])
+    return transactions, rejected
+
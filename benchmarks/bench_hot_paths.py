@@ -0,0 +1,206 @@
+"""Hot-path benchmark on synthetic data.
+
+For each scale (see synthetic_data.SCALES) a data set is generated in a
+temporary folder, inventory_core is configured to use it, and these are
+timed:
+  * load_or_create_file for product_details and master_data (cold, from disk,
+    and warm, from the table cache)
+  * save_to_file for both tables
+  * log_inventory_transaction
+  * search_product_in_details by name and by ID (first call builds the index)
+  * copy_files (the backup it schedules, run synchronously: first full copy
+    with a snapshot and an incremental pass after one more transaction,
+    which like most writes only updates the mirrors)
+  * with --branches, the consolidated cross-branch view
+
+Each entry records the median/min wall time and the peak memory traced
+during one extra run; the resident size of the loaded tables is reported too. Run from the repository root:
+
+    python benchmarks/bench_hot_paths.py --scales small,medium --output hot_paths.json
+    python benchmarks/bench_hot_paths.py --compare hot_paths.json
+
+--compare prints the time ratio of every entry against an earlier report.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import backup  # noqa: E402
+import branches  # noqa: E402
+import inventory_core  # noqa: E402
+import storage  # noqa: E402
+import synthetic_data  # noqa: E402
+from master_view import MASTER_COLUMNS  # noqa: E402
+
+PRODUCT_COLUMNS = ["Product Name", "Product ID"]
+
+
+def measure(function, repeat, setup=None):
+    """Time function over repeat runs, then trace its peak memory in one more run."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    # Tracing slows everything down, so memory gets its own run
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "median_seconds": statistics.median(times),
+        "min_seconds": min(times),
+        "runs": repeat,
+        "peak_memory_bytes": peak,
+    }
+
+
+def bench_scale(products, transactions, repeat, branch_count=0):
+    """Generate one data set and time every hot path on it (on the first branch's shard when sharded)."""
+    branch_names = [f"branch{i + 1}" for i in range(branch_count)]
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        synthetic_data.generate(folder, products, transactions, branches=branch_names)
+        generate_seconds = time.perf_counter() - start
+        paths = inventory_core.configure(folder, branch=branch_names[0] if branch_names else "")
+        details_file = inventory_core.PRODUCT_DETAILS_FILE
+        master_file = inventory_core.MASTER_DATA_FILE
+        product_details = storage.load_or_create_file(details_file, PRODUCT_COLUMNS)
+        master_data = storage.load_or_create_file(master_file, MASTER_COLUMNS)
+        # Resident size of the loaded tables, as kept in the table cache
+        table_memory = {
+            "product_details": int(product_details.memory_usage(deep=True).sum()),
+            "master_data": int(master_data.memory_usage(deep=True).sum()),
+        }
+        names = product_details["Product Name"].tolist()
+        ids = product_details["Product ID"].tolist()
+        lookups = iter(range(1 << 30))
+
+        def copy_files():
+            backup.run_backup(inventory_core.files_to_copy(), [inventory_core.backup_folder, inventory_core.backup_2_folder],
+                              inventory_core.snapshot_folder, inventory_core.SNAPSHOT_RETENTION,
+                              append_only=[inventory_core.INVENTORY_CATALOG_STORE],
+                              snapshot_interval=inventory_core.SNAPSHOT_INTERVAL)
+
+        def forget_backups():
+            # Without mirrors or a record of the last backup every file is copied again
+            backup._last_backup.clear()
+            for backup_folder in (inventory_core.backup_folder, inventory_core.backup_2_folder, inventory_core.snapshot_folder):
+                shutil.rmtree(backup_folder, ignore_errors=True)
+
+        results = {
+            "load_product_details_cold": measure(
+                lambda: storage.load_or_create_file(details_file, PRODUCT_COLUMNS), repeat,
+                setup=lambda: storage.invalidate(details_file)),
+            "load_product_details_warm": measure(lambda: storage.load_or_create_file(details_file, PRODUCT_COLUMNS), repeat),
+            "load_master_data_cold": measure(
+                lambda: storage.load_or_create_file(master_file, MASTER_COLUMNS), repeat,
+                setup=lambda: storage.invalidate(master_file)),
+            "load_master_data_warm": measure(lambda: storage.load_or_create_file(master_file, MASTER_COLUMNS), repeat),
+            "save_product_details": measure(lambda: storage.save_to_file(details_file, product_details), repeat),
+            "save_master_data": measure(lambda: storage.save_to_file(master_file, master_data), repeat),
+            "search_by_name_first": measure(
+                lambda: inventory_core.search_product_in_details(names[-1], "Product Name", product_details.copy()), repeat),
+        }
+        product_details = storage.load_or_create_file(details_file, PRODUCT_COLUMNS)
+        results["search_by_name_warm"] = measure(
+            lambda: inventory_core.search_product_in_details(names[next(lookups) % len(names)], "Product Name", product_details), repeat)
+        results["search_by_id_warm"] = measure(
+            lambda: inventory_core.search_product_in_details(ids[next(lookups) % len(ids)], "Product ID", product_details), repeat)
+        results["log_inventory_transaction"] = measure(
+            lambda: inventory_core.log_inventory_transaction(ids[next(lookups) % len(ids)], 5, 50.0, date.today()), repeat)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results["copy_files_full"] = measure(copy_files, repeat, setup=forget_backups)
+            results["copy_files_incremental"] = measure(
+                copy_files, repeat,
+                setup=lambda: inventory_core.log_inventory_transaction(ids[0], 1, 10.0, date.today()))
+        if branch_names:
+            results["consolidated_view"] = measure(lambda: branches.consolidated_view(paths), repeat)
+        storage.invalidate()
+    return {"products": products, "transactions": transactions, "branches": branch_count,
+            "generate_seconds": generate_seconds, "table_memory_bytes": table_memory, "results": results}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=REPO_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Print the median time ratio (new / old) of every entry both reports share."""
+    for scale, entry in report["scales"].items():
+        old = baseline.get("scales", {}).get(scale)
+        if old is None:
+            continue
+        print(f"{scale} ({entry['products']} products, {entry['transactions']} transactions)")
+        for name, result in entry["results"].items():
+            if name not in old["results"]:
+                continue
+            before = old["results"][name]["median_seconds"]
+            after = result["median_seconds"]
+            ratio = after / before if before else float("inf")
+            print(f"  {name:28} {before * 1000:10.2f} ms -> {after * 1000:10.2f} ms  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="small,medium",
+                        help=f"Comma-separated scales from {', '.join(synthetic_data.SCALES)}, or 'all'")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per entry")
+    parser.add_argument("--branches", type=int, default=0,
+                        help="Shard the transactions across this many branches and time the consolidated view")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    scales = list(synthetic_data.SCALES) if args.scales == "all" else args.scales.split(",")
+    unknown = [scale for scale in scales if scale not in synthetic_data.SCALES]
+    if unknown:
+        parser.error(f"Unknown scale(s): {', '.join(unknown)}")
+
+    report = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "storage_backend": storage.get_backend().name,
+        "scales": {},
+    }
+    for scale in scales:
+        products, transactions = synthetic_data.SCALES[scale]
+        print(f"Running {scale}: {products} products, {transactions} transactions", file=sys.stderr)
+        report["scales"][scale] = bench_scale(products, transactions, args.repeat, args.branches)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Startup benchmark for the Streamlit entry point.
+
+Measures, each in a fresh interpreter:
+  * import time of the inventory module
+  * first render of the app (cold script run) and a warm rerun
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py --runs 5 --output startup.json
+
+Pass --max-import / --max-render to exit non-zero when a median exceeds the
+budget, so regressions fail a check.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+import inventory
+print(time.perf_counter() - start)
+"""
+
+# Streamlit script that runs the app; INVENTORY_DATA_DIR points it at a scratch data folder
+APP_SCRIPT = """
+import sys
+sys.path.insert(0, {repo!r})
+import inventory
+inventory.main()
+"""
+
+RENDER_SNIPPET = """
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({script!r}, default_timeout=120)
+app.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+app.run()
+rerun = time.perf_counter() - start
+if app.exception:
+    raise SystemExit(app.exception[0].value)
+print(first, rerun)
+"""
+
+
+def _run(snippet, data_dir):
+    env = dict(os.environ, INVENTORY_DATA_DIR=data_dir, INVENTORY_BRANCH="")
+    result = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, cwd=REPO_DIR, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or result.stdout.strip())
+    # The timings are on the last line; anything before it is output from the app
+    return [float(value) for value in result.stdout.strip().splitlines()[-1].split()]
+
+
+def measure(runs):
+    """Return the startup timings (seconds) over several fresh interpreters."""
+    import_times, first_renders, reruns = [], [], []
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.makedirs(os.path.join(data_dir, "photo"))
+        logo_file = os.path.join(data_dir, "photo", "sridhivyum logo.jpg")
+        with open(logo_file, "wb") as f:
+            # 1x1 transparent PNG
+            f.write(bytes.fromhex(
+                "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+                "1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082"
+            ))
+        script = os.path.join(data_dir, "app.py")
+        with open(script, "w") as f:
+            f.write(APP_SCRIPT.format(repo=REPO_DIR))
+
+        for _ in range(runs):
+            import_times.append(_run(IMPORT_SNIPPET.format(repo=REPO_DIR), data_dir)[0])
+            first, rerun = _run(RENDER_SNIPPET.format(script=script), data_dir)
+            first_renders.append(first)
+            reruns.append(rerun)
+
+    return {
+        "runs": runs,
+        "import_seconds": statistics.median(import_times),
+        "first_render_seconds": statistics.median(first_renders),
+        "rerun_seconds": statistics.median(reruns),
+        "samples": {"import": import_times, "first_render": first_renders, "rerun": reruns},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--max-import", type=float, help="Fail if median import time exceeds this many seconds")
+    parser.add_argument("--max-render", type=float, help="Fail if median first render exceeds this many seconds")
+    args = parser.parse_args()
+
+    report = measure(args.runs)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+    failed = False
+    if args.max_import is not None and report["import_seconds"] > args.max_import:
+        print(f"Import time {report['import_seconds']:.3f}s exceeds {args.max_import}s", file=sys.stderr)
+        failed = True
+    if args.max_render is not None and report["first_render_seconds"] > args.max_render:
+        print(f"First render {report['first_render_seconds']:.3f}s exceeds {args.max_render}s", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Synthetic shop data for benchmarks.
+
+Writes product_details, master_data and the transaction store into a folder,
+with the same layout the app uses (point INVENTORY_DATA_DIR at it):
+
+    python benchmarks/synthetic_data.py /tmp/shop --products 10000 --transactions 100000
+    python benchmarks/synthetic_data.py /tmp/shop --branches north,south,east
+
+Tables are saved through the selected storage backend (INVENTORY_STORAGE_BACKEND).
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import config  # noqa: E402
+import master_view  # noqa: E402
+import storage  # noqa: E402
+import transaction_store  # noqa: E402
+
+# Named sizes used by bench_hot_paths.py: name -> (products, transactions)
+SCALES = {
+    "small": (1_000, 10_000),
+    "medium": (10_000, 100_000),
+    "large": (100_000, 1_000_000),
+}
+
+ADJECTIVES = ["pure", "roasted", "fine", "raw", "premium", "organic", "refined", "crushed", "whole", "sweet"]
+ITEMS = ["sugar", "ghee", "cashew", "almond", "cardamom", "jaggery", "besan", "maida", "milk powder", "pista",
+         "saffron", "rava", "coconut", "raisin", "butter", "khoya", "rose water", "silver leaf", "oil", "boxes"]
+USAGE_SHARE = 0.3  # Fraction of transactions that are factory usage
+HISTORY_DAYS = 730
+
+
+def data_files(folder, branch=""):
+    """Return the data file paths the app would use with INVENTORY_DATA_DIR=folder."""
+    paths = config.Paths(folder, branch)
+    return {
+        "PRODUCT_DETAILS_FILE": paths.product_details_file,
+        "MASTER_DATA_FILE": paths.master_data_file,
+        "INVENTORY_CATALOG_FILE": paths.inventory_catalog_file,
+        "INVENTORY_CATALOG_STORE": paths.inventory_catalog_store,
+    }
+
+
+def product_names(count, rng):
+    """Return count unique lower-case product names."""
+    adjectives = rng.choice(ADJECTIVES, count)
+    items = rng.choice(ITEMS, count)
+    return [f"{adjective} {item} {i + 1}" for i, (adjective, item) in enumerate(zip(adjectives, items))]
+
+
+def transactions(products, count, rng):
+    """Return count catalog rows spread over the last HISTORY_DAYS days, oldest first."""
+    product_id = rng.integers(1, products + 1, count)
+    usage = rng.random(count) < USAGE_SHARE
+    quantity = rng.integers(1, 50, count).astype(float)
+    unit_price = np.round(rng.uniform(5, 500, products + 1), 2)[product_id]
+    end = pd.Timestamp.now().normalize()
+    purchase_date = np.sort(end - pd.to_timedelta(rng.integers(0, HISTORY_DAYS, count), unit="D"))
+    return pd.DataFrame({
+        "Product ID": product_id,
+        "Quantity Added": np.where(usage, -quantity / 2, quantity),
+        "Total Cost": np.round(quantity * np.where(usage, 0.5, 1.0) * unit_price, 2),
+        "Purchase Date": purchase_date,
+        "Timestamp": purchase_date + pd.to_timedelta(np.arange(count) % 86_400, unit="s"),
+    })
+
+
+def _write_store(store_path, catalog):
+    """Bulk-insert catalog rows into a new transaction store.
+
+    The store's tables come from transaction_store.get_connection; rows go
+    straight into the log, and the rollup tables are then rebuilt from them.
+    """
+    transaction_store.get_connection(store_path)
+    conn = sqlite3.connect(store_path)
+    rows = zip(
+        catalog["Product ID"].tolist(),
+        catalog["Quantity Added"].tolist(),
+        catalog["Total Cost"].tolist(),
+        catalog["Purchase Date"].dt.strftime("%Y-%m-%d").tolist(),
+        catalog["Timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S").tolist(),
+    )
+    conn.executemany(
+        "INSERT INTO inventory_catalog (product_id, quantity_added, total_cost, purchase_date, timestamp) "
+        "VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+    transaction_store.rebuild_rollups(store_path)
+
+
+def generate(folder, products, transaction_count, seed=0, branches=()):
+    """Write a synthetic data set under folder (used as INVENTORY_DATA_DIR); returns the first branch's file paths.
+
+    With branches, transactions are spread across that many branch shards
+    sharing one product master.
+    """
+    rng = np.random.default_rng(seed)
+    branches = list(branches) or [""]
+    files = data_files(folder, branches[0])
+    os.makedirs(os.path.dirname(files["PRODUCT_DETAILS_FILE"]), exist_ok=True)
+
+    product_details = pd.DataFrame({"Product Name": product_names(products, rng), "Product ID": np.arange(1, products + 1)})
+    storage.save_to_file(files["PRODUCT_DETAILS_FILE"], product_details)
+
+    catalog = transactions(products, transaction_count, rng)
+    shard = rng.integers(0, len(branches), transaction_count)
+    for i, branch in enumerate(branches):
+        branch_files = data_files(folder, branch)
+        os.makedirs(os.path.dirname(branch_files["MASTER_DATA_FILE"]), exist_ok=True)
+        branch_catalog = catalog[shard == i].reset_index(drop=True)
+        _write_store(branch_files["INVENTORY_CATALOG_STORE"], branch_catalog)
+        storage.save_to_file(branch_files["MASTER_DATA_FILE"], master_view.rebuild_master_data(branch_catalog))
+    storage.invalidate()  # Benchmarks should start from disk, not from the writes above
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder")
+    parser.add_argument("--products", type=int, default=SCALES["small"][0])
+    parser.add_argument("--transactions", type=int, default=SCALES["small"][1])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--branches", default="", help="Comma-separated branch names to shard the transactions across")
+    args = parser.parse_args()
+    branches = [branch for branch in args.branches.split(",") if branch]
+    files = generate(args.folder, args.products, args.transactions, args.seed, branches)
+    backend = storage.get_backend()
+    print(backend.path_for(files["PRODUCT_DETAILS_FILE"]))
+    print(backend.path_for(files["MASTER_DATA_FILE"]))
+    print(files["INVENTORY_CATALOG_STORE"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import config
+import master_view
+import storage
+from master_view import MASTER_COLUMNS
+
+# A branch's daily work only touches its own shard; this module reads all of
+# them for the cross-branch view.
+
+
+def read_shard(master_data_file):
+    """Read one branch's master_data (empty if the branch has none yet); runs in a worker process."""
+    backend = storage.get_backend()
+    if not backend.exists(master_data_file):
+        return pd.DataFrame(columns=MASTER_COLUMNS)
+    return backend.read(master_data_file)
+
+
+def shard_files(paths):
+    """Return {branch: master_data file} for every branch, with "" for the single-shop file.
+
+    The single-shop file is left out only when branches exist and it
+    doesn't: a shop that adds branches keeps its original stock there.
+    """
+    main_file = paths.for_branch("").master_data_file
+    branch_names = config.list_branches(paths)
+    files = {}
+    if not branch_names or storage.get_backend().exists(main_file):
+        files[""] = main_file
+    files.update((branch, paths.for_branch(branch).master_data_file) for branch in branch_names)
+    return files
+
+
+def shard_signature(paths):
+    """Return a value that changes whenever any branch's master_data is rewritten."""
+    backend = storage.get_backend()
+    return tuple((branch, backend.signature(file_path)) for branch, file_path in shard_files(paths).items())
+
+
+def read_shards(paths, max_workers=None):
+    """Read every branch's master_data, in parallel worker processes when there are several."""
+    files = shard_files(paths)
+    if len(files) > 1:
+        workers = min(len(files), max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(read_shard, files.values()))
+    else:
+        frames = [read_shard(file_path) for file_path in files.values()]
+    return dict(zip(files, frames))
+
+
+def consolidated_view(paths, max_workers=None):
+    """Return (master_data across all branches, Total Quantity per product and branch)."""
+    shards = read_shards(paths, max_workers)
+    consolidated = master_view.consolidate(shards.values())
+    stock = {}
+    for branch, master_data in shards.items():
+        ids = pd.to_numeric(master_data["Product ID"], errors="coerce")
+        quantity = pd.to_numeric(master_data["Total Quantity"], errors="coerce")
+        stock[branch or "Main"] = pd.Series(quantity.values, index=ids.values).groupby(level=0).sum()
+    by_branch = pd.DataFrame(stock).fillna(0)
+    by_branch.index = by_branch.index.astype(int)
+    by_branch.index.name = "Product ID"
+    return consolidated, by_branch.reset_index()
@@ -0,0 +1,84 @@
+"""Where the inventory data lives.
+
+Each setting is taken from its environment variable, then from a JSON config
+file (INVENTORY_CONFIG, default inventory_config.json in the working
+directory), then from the default:
+
+    INVENTORY_DATA_DIR / "data_dir"   root folder holding "Data Base", the backups and the logo
+    INVENTORY_BRANCH / "branch"       outlet this terminal works for; empty for a single shop
+
+The product master is shared by every branch. Each branch keeps its own
+master_data and inventory catalog under "Data Base/branches/<branch>".
+"""
+import json
+import os
+import re
+import transaction_store
+
+DEFAULT_DATA_DIR = "D:/Sri Divyam Inventory Application"
+DEFAULT_CONFIG_FILE = "inventory_config.json"
+SETTINGS = {
+    "data_dir": ("INVENTORY_DATA_DIR", DEFAULT_DATA_DIR),
+    "branch": ("INVENTORY_BRANCH", ""),
+}
+BRANCH_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9 _-]*$")
+
+
+def _file_settings():
+    """Read the JSON config file, if there is one."""
+    config_file = os.environ.get("INVENTORY_CONFIG", DEFAULT_CONFIG_FILE)
+    if not os.path.exists(config_file):
+        return {}
+    with open(config_file) as f:
+        return json.load(f)
+
+
+def setting(name):
+    """Return a setting from the environment, the config file or its default."""
+    env_var, default = SETTINGS[name]
+    value = os.environ.get(env_var)
+    if value is None:
+        value = _file_settings().get(name, default)
+    return value
+
+
+class Paths:
+    """File and folder locations for one branch (or the single-shop layout when branch is empty)."""
+
+    def __init__(self, data_dir, branch=""):
+        branch = (branch or "").strip()
+        if branch and not BRANCH_NAME.match(branch):
+            raise ValueError(f"Invalid branch name '{branch}': use letters, digits, spaces, '-' and '_'")
+        self.data_dir = data_dir
+        self.branch = branch
+        self.data_base_folder = os.path.join(data_dir, "Data Base")
+        self.product_details_file = os.path.join(self.data_base_folder, "product_details.xlsx")
+        self.branch_folder = os.path.join(self.data_base_folder, "branches", branch) if branch else self.data_base_folder
+        self.master_data_file = os.path.join(self.branch_folder, "master_data.xlsx")
+        self.inventory_catalog_file = os.path.join(self.branch_folder, "inventory_catalog.xlsx")
+        self.inventory_catalog_store = transaction_store.store_path_for(self.inventory_catalog_file)
+        # Backups are kept per branch, since every branch has files with the same names
+        self.backup_folder = self._per_branch(os.path.join(data_dir, "backup"))
+        self.backup_2_folder = self._per_branch(os.path.join(data_dir, "backup_2"))
+        self.snapshot_folder = self._per_branch(os.path.join(data_dir, "snapshots"))
+        self.logo_file = os.path.join(data_dir, "photo", "sridhivyum logo.jpg")
+
+    def _per_branch(self, folder):
+        return os.path.join(folder, self.branch) if self.branch else folder
+
+    def for_branch(self, branch):
+        """Return the paths of another branch in the same data folder."""
+        return Paths(self.data_dir, branch)
+
+
+def load_paths(data_dir=None, branch=None):
+    """Return the Paths for the configured (or given) data folder and branch."""
+    return Paths(data_dir or setting("data_dir"), setting("branch") if branch is None else branch)
+
+
+def list_branches(paths):
+    """Return the names of the branches that have a shard in the data folder."""
+    branches_folder = os.path.join(paths.data_base_folder, "branches")
+    if not os.path.isdir(branches_folder):
+        return []
+    return sorted(name for name in os.listdir(branches_folder) if os.path.isdir(os.path.join(branches_folder, name)))
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+# Defaults for the Low Stock page
+DEFAULT_WINDOW_DAYS = 30
+DEFAULT_LEAD_TIME_DAYS = 7
+DEFAULT_REVIEW_DAYS = 14
+DEFAULT_SERVICE_Z = 1.65  # ~95% chance of not running out during the lead time
+
+FORECAST_COLUMNS = [
+    "Product ID", "Total Quantity", "Daily Usage", "Days Until Stock-Out",
+    "Reorder Point", "Suggested Purchase Quantity", "At Risk"
+]
+
+
+def forecast_stock(master_data, usage, window_days=DEFAULT_WINDOW_DAYS, lead_time_days=DEFAULT_LEAD_TIME_DAYS,
+                   review_days=DEFAULT_REVIEW_DAYS, service_z=DEFAULT_SERVICE_Z):
+    """Compute stock-out and reorder figures for every product in one vectorised pass.
+
+    usage holds, per Product ID, the "Quantity Out" and "Quantity Out Squared"
+    summed over daily buckets in the last window_days (days without usage
+    count as zero). The reorder point covers average usage over the lead time
+    plus safety stock for its variability; the suggested purchase tops stock
+    up to the reorder point plus one review period of usage.
+    """
+    ids = pd.to_numeric(master_data["Product ID"], errors="coerce")
+    stock = pd.to_numeric(master_data["Total Quantity"], errors="coerce").fillna(0)
+    frame = pd.DataFrame({"Product ID": ids, "Total Quantity": stock}).dropna(subset=["Product ID"])
+    frame = frame.drop_duplicates("Product ID")
+    frame["Product ID"] = frame["Product ID"].astype(int)
+    usage = usage.set_index("Product ID").reindex(frame["Product ID"]).fillna(0)
+
+    stock = frame["Total Quantity"].to_numpy(dtype=float)
+    used = usage["Quantity Out"].to_numpy(dtype=float)
+    used_squared = usage["Quantity Out Squared"].to_numpy(dtype=float)
+
+    velocity = used / window_days
+    variance = np.clip(used_squared / window_days - velocity ** 2, 0, None)
+    safety_stock = service_z * np.sqrt(variance * lead_time_days)
+    reorder_point = velocity * lead_time_days + safety_stock
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_left = np.where(velocity > 0, np.clip(stock, 0, None) / velocity, np.inf)
+    suggested = np.clip(reorder_point + velocity * review_days - stock, 0, None)
+
+    frame["Daily Usage"] = velocity
+    frame["Days Until Stock-Out"] = days_left
+    frame["Reorder Point"] = reorder_point
+    frame["Suggested Purchase Quantity"] = np.where(velocity > 0, suggested, 0)
+    frame["At Risk"] = (velocity > 0) & (stock <= reorder_point)
+    return frame[FORECAST_COLUMNS].sort_values("Days Until Stock-Out", kind="stable").reset_index(drop=True)
@@ -0,0 +1,115 @@
+"""Opt-in timing of the app's hot paths.
+
+Set INVENTORY_TIMING=1 before starting the app to time every function
+decorated with @timed. Each call is appended as a JSON line to a rotating
+log (INVENTORY_TIMING_LOG, default inventory_timing.log), and calls made
+during a rerun are kept for the app's debug panel. When timing is off,
+@timed returns the function unchanged, so it costs nothing.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from logging.handlers import RotatingFileHandler
+
+ENABLED = os.environ.get("INVENTORY_TIMING", "").lower() in ("1", "true", "yes", "on")
+LOG_FILE = os.environ.get("INVENTORY_TIMING_LOG", "inventory_timing.log")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+_local = threading.local()
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def _get_logger():
+    """Create the JSON-lines timing logger on first use."""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger("inventory.timing")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+
+def _row_count(result, args):
+    """Return the rows a call returned, or else the rows of the first table it was given."""
+    for value in (result, *args):
+        if hasattr(value, "shape") and getattr(value, "ndim", 0) in (1, 2):
+            return int(value.shape[0])
+        if isinstance(value, tuple) and value and hasattr(value[0], "shape"):
+            return int(value[0].shape[0])  # e.g. (transactions, rejected)
+    return None
+
+
+def _record(name, seconds, rows, depth, records=None, slot=None):
+    entry = {
+        "time": time.time(),
+        "run": getattr(_local, "run_id", None),
+        "name": name,
+        "ms": round(seconds * 1000, 3),
+        "rows": rows,
+        "depth": depth,
+        "thread": threading.current_thread().name,
+    }
+    if records is not None:
+        records[slot] = entry
+    _get_logger().info(json.dumps(entry))
+
+
+def timed(name=None):
+    """Decorator that times a function and counts the rows it handled, when timing is enabled."""
+    def decorate(function):
+        if not ENABLED:
+            return function
+        label = name or f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            depth = getattr(_local, "depth", 0)
+            _local.depth = depth + 1
+            # Reserve the call's place so the panel lists calls in the order they started
+            records = getattr(_local, "records", None)
+            slot = None
+            if records is not None:
+                slot = len(records)
+                records.append(None)
+            start = time.perf_counter()
+            result = None
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                _local.depth = depth
+                _record(label, time.perf_counter() - start, _row_count(result, args), depth, records, slot)
+        return wrapper
+    return decorate
+
+
+def begin_run():
+    """Start collecting the calls of one rerun on this thread."""
+    if not ENABLED:
+        return
+    _local.run_id = uuid.uuid4().hex[:8]
+    _local.records = []
+    _local.depth = 0
+    _local.started = time.perf_counter()
+
+
+def end_run():
+    """Stop collecting; returns (records, total seconds) for the rerun, or ([], 0) when timing is off."""
+    records = getattr(_local, "records", None)
+    if not ENABLED or records is None:
+        return [], 0.0
+    total = time.perf_counter() - _local.started
+    _local.records = None
+    _record("rerun", total, None, 0)
+    return records, total
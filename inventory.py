@@ -1,194 +1,51 @@
 import streamlit as st
 import pandas as pd
-import os
-import matplotlib.pyplot as plt
-import seaborn as sns
-import shutil
 from datetime import datetime
-
-# File paths
-PRODUCT_DETAILS_FILE = "D:/Sri Divyam Inventory Application/Data Base/product_details.xlsx"
-MASTER_DATA_FILE = "D:/Sri Divyam Inventory Application/Data Base/master_data.xlsx"
-INVENTORY_CATALOG_FILE = "D:/Sri Divyam Inventory Application/Data Base/inventory_catalog.xlsx"
-data_base_folder = "D:/Sri Divyam Inventory Application/Data Base"
-backup_folder = "D:/Sri Divyam Inventory Application/backup"
-backup_2_folder = "D:/Sri Divyam Inventory Application/backup_2"
-
-# List of files to be copied
-files_to_copy = [
-    "product_details.xlsx",
-    "master_data.xlsx",
-    "inventory_catalog.xlsx"
-]
-
-def create_folder_if_not_exists(folder_path):
-    """Create a folder if it doesn't exist."""
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
-def copy_files():
-    """Copy the files from the Data Base folder to backup and backup_2 folders."""
-    create_folder_if_not_exists(backup_folder)
-    create_folder_if_not_exists(backup_2_folder)
-
-    for file_name in files_to_copy:
-        src_file = os.path.join(data_base_folder, file_name)
-        
-        # Ensure the file exists before copying
-        if os.path.exists(src_file):
-            # Copy to backup folder
-            shutil.copy(src_file, os.path.join(backup_folder, file_name))
-            # Copy to backup_2 folder
-            shutil.copy(src_file, os.path.join(backup_2_folder, file_name))
-            print(f"Copied {file_name} to backup and backup_2 folders.")
-        else:
-            print(f"{file_name} does not exist in the Data Base folder.")
-
-# Helper Functions
-def load_or_create_file(file_path, columns):
-    """Load an Excel file or create one with specified columns if it doesn't exist."""
-    if os.path.exists(file_path):
-        df = pd.read_excel(file_path)
-        for column in columns:
-            if column not in df.columns:
-                df[column] = None
-        return df
-    else:
-        df = pd.DataFrame(columns=columns)
-        save_to_file(file_path, df)  # Save empty DataFrame if file doesn't exist
-        return df
-
-def save_to_file(file_path, df):
-    """Save the DataFrame to the specified file path and also to a backup location."""
-    with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False)
-
-def generate_product_id(existing_ids):
-    """Generate a unique product ID in the format 01, 02, 03."""
-    if existing_ids.empty:
-        return 1
-    last_id = max(existing_ids)
-    next_id = last_id + 1
-    return next_id
-
-def validate_product_name(product_name, product_details):
-    """Check if the product name is valid and unique."""
-    if product_name.strip() == "":
-        return "empty"
-    if product_name.lower() in product_details["Product Name"].str.lower().values:
-        return "exists"
-    return "valid"
-
-def add_new_product(product_name, product_details):
-    """Add a new product to the product details DataFrame."""
-    product_name_lower = product_name.strip().lower()
-    new_id = generate_product_id(product_details["Product ID"].fillna(0).astype(int))
-    
-    new_product = {
-        "Product Name": product_name_lower,
-        "Product ID": new_id
-    }
-    product_details = pd.concat([product_details, pd.DataFrame([new_product])], ignore_index=True)
-    save_to_file(PRODUCT_DETAILS_FILE, product_details)
-    return new_id
-
-def search_product_in_details(search_input, search_by, product_details):
-    """Search for a product by name or ID in product_details.xlsx."""
-    if search_by == "Product Name":
-        return product_details[product_details["Product Name"].str.lower() == search_input.lower()]
-    elif search_by == "Product ID":
-        return product_details[product_details["Product ID"].astype(int) == int(search_input)]
-    return pd.DataFrame()
-
-def search_product_in_master(search_input, search_by, master_data):
-    """Search for a product by name or ID in master_data."""
-    if search_by == "Product Name":
-        return master_data[master_data["Product ID"].astype(int) == int(search_input)]
-    elif search_by == "Product ID":
-        return master_data[master_data["Product ID"].astype(int) == int(search_input)]
-    return pd.DataFrame()
-
-def log_inventory_transaction(product_id, quantity, total_cost, purchase_date, inventory_catalog, master_data):
-    """Log the transaction in the inventory catalog with timestamp and update master_data."""
-    timestamp = datetime.now()  # Get the current timestamp
-    transaction = {
-        "Product ID": product_id,
-        "Quantity Added": quantity,  # Quantity should be negative for factory usage
-        "Total Cost": total_cost,
-        "Purchase Date": purchase_date,
-        "Timestamp": timestamp
-    }
-    
-    # Add transaction to inventory catalog
-    inventory_catalog = pd.concat([inventory_catalog, pd.DataFrame([transaction]).dropna(axis=1, how='all')], ignore_index=True)
-    
-    # Save the updated inventory catalog
-    save_to_file(INVENTORY_CATALOG_FILE, inventory_catalog)
-
-    # Retrieve product name from product_details
-    product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
-    product_name = product_details.loc[product_details["Product ID"] == product_id, "Product Name"].values[0]
-
-    # Update master_data
-    product_in_master = master_data[master_data["Product ID"] == product_id]
-    
-    if product_in_master.empty:
-        # If product is not found, create a new entry in master_data (if needed)
-        avg_price = total_cost / quantity  # Average price calculation
-        new_entry = {
-            "Product ID": product_id,
-            "Total Quantity": quantity,
-            "Average Price": avg_price,
-            "Highest Price": avg_price,
-            "Latest Price": avg_price,
-            "Latest Purchase Date": pd.to_datetime(purchase_date)  # Convert to datetime
-        }
-        master_data = pd.concat([master_data, pd.DataFrame([new_entry]).dropna(axis=1, how='all')], ignore_index=True)
-    else:
-        # If product exists in master_data, update the fields
-        idx = product_in_master.index[0]
-        
-        # Get existing data from master_data
-        old_quantity = master_data.at[idx, "Total Quantity"]
-        old_avg_price = master_data.at[idx, "Average Price"]
-        old_highest_price = master_data.at[idx, "Highest Price"]
-        old_latest_price = master_data.at[idx, "Latest Price"]
-        old_latest_date = master_data.at[idx, "Latest Purchase Date"]
-
-        # Calculate new average price, total quantity, and highest price
-        new_avg_price = (old_quantity * old_avg_price + quantity * (total_cost / quantity)) / (old_quantity + quantity)
-        new_highest_price = max(old_highest_price, total_cost / quantity)
-
-        # Update the row in master_data
-        master_data.at[idx, "Total Quantity"] = old_quantity + quantity
-        master_data.at[idx, "Average Price"] = new_avg_price
-        master_data.at[idx, "Highest Price"] = new_highest_price
-        master_data.at[idx, "Latest Price"] = total_cost / quantity
-        master_data.at[idx, "Latest Purchase Date"] = pd.to_datetime(purchase_date)  # Convert to datetime
-
-    # Save the updated master_data
-    save_to_file(MASTER_DATA_FILE, master_data)
-   
-
-
-def rename_product(product_id, new_name, product_details):
-    """Rename an existing product in the product details DataFrame."""
-    product_id = int(product_id)  # Ensure product_id is treated as integer
-    # Search for the product by ID
-    product = product_details[product_details["Product ID"] == product_id]
-    
-    if product.empty:
-        return "Product not found"
-    
-    # Check if new name already exists
-    if new_name.strip().lower() in product_details["Product Name"].str.lower().values:
-        return "Product name already exists"
-    
-    # Update the product name
-    product_details.loc[product_details["Product ID"] == product_id, "Product Name"] = new_name.strip().lower()
-    save_to_file(PRODUCT_DETAILS_FILE, product_details)
-    return "Product renamed successfully"
+import batch_entry
+import branches
+import config
+import forecast
+import instrumentation
+import lot_ledger
+import master_view
+import product_search
+import transaction_store
+from inventory_core import (
+    PRODUCT_DETAILS_FILE, MASTER_DATA_FILE, INVENTORY_CATALOG_FILE, INVENTORY_CATALOG_STORE,
+    paths, recover_interrupted_writes, copy_files, validate_product_name, add_new_product,
+    search_product_in_details, search_product_in_master, log_inventory_transaction,
+    validate_and_log_batch, rename_product, rebuild_master_data
+)
+from instrumentation import timed
+from master_view import MASTER_COLUMNS
+from product_index import product_details_index
+from storage import load_or_create_file
+
+LOGO_FILE = paths.logo_file
 
 # Streamlit Interface Functions
+def typeahead_product_input(product_details, key):
+    """Let the user type part of a product name and pick from ranked matches; returns the Product ID."""
+    query = st.text_input("Start typing a product name:", key=f"{key}_typeahead")
+    if not query:
+        return None
+    matches = product_search.search_index_for(product_details).search(query)
+    if not matches:
+        st.error("No matching products. Please try again.")
+        return None
+    options = {f"{name} (ID {product_id})": product_id for product_id, name, _ in matches}
+    choice = st.selectbox("Matching products", list(options), key=f"{key}_matches")
+    return options[choice]
+
+def product_search_input(key):
+    """Ask for a product by name, ID or typeahead; returns (search_input, search_by)."""
+    search_by = st.radio("Search By", ["Product Name", "Product ID", "Typeahead"])
+    if search_by == "Typeahead":
+        product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
+        return typeahead_product_input(product_details, key), "Product ID"
+    return st.text_input(f"Enter {search_by}:"), search_by
+
+@timed()
 def handle_new_product():
     """Handle adding a new product through the Streamlit interface."""
     st.title("Add New Product")
@@ -204,16 +61,21 @@ def handle_new_product():
         elif validation_result == "exists":
             st.warning(f"The product '{product_name}' already exists!")
         else:
-            new_id = add_new_product(product_name, product_details)
-            st.success(f"Product '{product_name}' added successfully with ID {new_id}!")
+            try:
+                new_id = add_new_product(product_name)
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                st.success(f"Product '{product_name}' added successfully with ID {new_id}!")
+                copy_files()
 
+@timed()
 def handle_add_quantity():
     """Handle adding quantity to an existing product."""
     st.title("Add Quantity to an Existing Product")
 
-    # Search for a product either by Name or ID
-    search_by = st.radio("Search By", ["Product Name", "Product ID"])
-    search_input = st.text_input(f"Enter {search_by}:")
+    # Search for a product by Name, ID or typeahead
+    search_input, search_by = product_search_input("add_quantity")
 
     if search_input:
         # Load product details
@@ -228,14 +90,10 @@ def handle_add_quantity():
             st.write(f"**Product ID:** {product_details_row['Product ID']}")
 
             # Now load the master data to fetch available quantity
-            master_data = load_or_create_file(MASTER_DATA_FILE, [
-                "Product ID", "Total Quantity", 
-                "Average Price", "Latest Price", "Highest Price", 
-                "Lowest Price", "Latest Purchase Date"
-            ])
+            master_data = load_or_create_file(MASTER_DATA_FILE, MASTER_COLUMNS)
 
             # Search for the product in master data
-            product_in_master = master_data[master_data["Product ID"] == product_details_row["Product ID"]]
+            product_in_master = search_product_in_master(product_details_row["Product ID"], "Product ID", master_data)
 
             if not product_in_master.empty:
                 available_quantity = product_in_master["Total Quantity"].values[0]
@@ -246,6 +104,7 @@ def handle_add_quantity():
                 quantity = st.number_input("Enter Quantity to Add:", min_value=0.01, format="%.2f")
                 total_cost = st.number_input("Enter Total Cost (₹):", min_value=0.01, format="%.2f")
                 purchase_date = st.date_input("Purchase Date:", value=datetime.today())
+                expiry_date = st.date_input("Expiry Date (optional):", value=None)
                 submit_button = st.form_submit_button(label="Add Quantity")
 
                 if submit_button:
@@ -253,18 +112,17 @@ def handle_add_quantity():
                         st.warning("Quantity and Total Cost must be greater than zero.")
                     else:
                         # Log the transaction and update master_data
-                        inventory_catalog = load_or_create_file(INVENTORY_CATALOG_FILE, [
-                            "Product ID", "Quantity Added", "Total Cost", "Purchase Date", "Timestamp"
-                        ])
-                        log_inventory_transaction(product_details_row["Product ID"], quantity, total_cost, purchase_date, inventory_catalog, master_data)
+                        log_inventory_transaction(product_details_row["Product ID"], quantity, total_cost, purchase_date, expiry_date)
 
                         st.success(f"Successfully added {quantity} units to {product_details_row['Product Name']}!")
+                        copy_files()
+@timed()
 def handle_search_product():
     """Handle searching a product and displaying the master data."""
     st.title("Search a Product")
     
-    search_by = st.radio("Search By", ["Product Name", "Product ID"])
-    search_input = st.text_input(f"Enter {search_by}:")
+    # Search for a product by Name, ID or typeahead
+    search_input, search_by = product_search_input("search_product")
 
     if search_input:
         # Load product details
@@ -285,29 +143,26 @@ def handle_search_product():
                 st.write(f"**Product ID:** {product_id}")
         else:
             # If searching by Product ID, ensure input is an integer
-            product_id = int(search_input.strip())
+            product_id = int(str(search_input).strip())
             st.write(f"**Product ID:** {product_id}")
 
         if product_id is not None:
             # Now search for the product in master_data using the ID
-            master_data = load_or_create_file(MASTER_DATA_FILE, [
-                "Product ID", "Total Quantity", 
-                "Average Price", "Latest Price", "Highest Price", 
-                "Lowest Price", "Latest Purchase Date"
-            ])
+            master_data = load_or_create_file(MASTER_DATA_FILE, MASTER_COLUMNS)
             
-            product_in_master = master_data[master_data["Product ID"] == product_id]
+            product_in_master = search_product_in_master(product_id, "Product ID", master_data)
             if product_in_master.empty:
                 st.error(f"Product with ID '{product_id}' not found in master data.")
             else:
                 # Retrieve product name from product_details using product_id
-                product_name = product_details[product_details["Product ID"] == product_id]["Product Name"].values[0]
+                product_name = search_product_in_details(product_id, "Product ID", product_details)["Product Name"].values[0]
                 
                 # Display product name along with the details from master_data
                 st.write(f"**Product Name:** {product_name}")
                 st.write("### Product Details from Master Data")
                 st.write(product_in_master)
 
+@timed()
 def handle_rename_product():
     """Handle renaming an existing product through the Streamlit interface."""
     st.title("Rename an Existing Product")
@@ -317,11 +172,11 @@ def handle_rename_product():
     product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
     
     if search_by == "Product Name":
-        product_names = product_details["Product Name"].tolist()
-        search_input = st.selectbox("Select Product Name", product_names)
+        # Typeahead over the search index instead of a selectbox holding every name
+        search_input = typeahead_product_input(product_details, "rename_product")
+        search_by = "Product ID"
     else:
-        product_ids = product_details["Product ID"].tolist()
-        search_input = st.selectbox("Select Product ID", product_ids)
+        search_input = st.text_input("Enter Product ID:")
     
     if search_input:
         product = search_product_in_details(search_input, search_by, product_details)
@@ -343,45 +198,221 @@ def handle_rename_product():
                     st.warning("Product name cannot be empty!")
                 else:
                     # Rename the product in the details
-                    result = rename_product(product_details_row["Product ID"], new_name, product_details)
+                    result = rename_product(product_details_row["Product ID"], new_name)
                     if result == "Product renamed successfully":
                         st.success(f"Product has been renamed to {new_name} successfully!")
+                        copy_files()
                     else:
                         st.warning(result)
-def load_or_create_file(file_path, columns):
-    """Load an Excel file or create one with specified columns if it doesn't exist."""
-    if os.path.exists(file_path):
-        df = pd.read_excel(file_path)
-        for column in columns:
-            if column not in df.columns:
-                df[column] = None
-        return df
+@timed()
+def handle_batch_entry():
+    """Handle entering many purchases or usage records at once from an upload or a grid."""
+    st.title("Batch Entry")
+    entry_type = st.radio("Entry Type", ["Purchases", "Factory Usage"])
+    if entry_type == "Factory Usage":
+        costing_method = st.radio("Costing Method", lot_ledger.COSTING_METHODS, index=lot_ledger.COSTING_METHODS.index(lot_ledger.default_costing_method()), horizontal=True)
+    st.write("Each row needs a Product (name or ID), Quantity and Date; purchases also need Total Cost and can have an Expiry Date.")
+
+    uploaded_file = st.file_uploader("Upload a CSV or Excel file", type=["csv", "xlsx"])
+    batch = batch_entry.empty_batch()
+    if uploaded_file is not None:
+        try:
+            batch = batch_entry.read_batch_file(uploaded_file, usage=entry_type == "Factory Usage")
+        except ValueError as e:
+            st.error(str(e))
+    batch = st.data_editor(batch, num_rows="dynamic", key="batch_grid")
+
+    if st.button("Submit Batch"):
+        usage = entry_type == "Factory Usage"
+
+        def validate(product_details, master_data):
+            ledger = None
+            if usage and costing_method == "FIFO":
+                ledger = lot_ledger.get_ledger(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+            transactions, rejected = batch_entry.validate_batch(batch, product_details, master_data, usage=usage, ledger=ledger)
+            # All or nothing: save only if every row is valid
+            return transactions if rejected.empty else transactions.iloc[:0], (transactions, rejected)
+
+        # Validated under the write lock, so stock can't change between the check and the write
+        transactions, rejected = validate_and_log_batch(validate)
+        if not rejected.empty:
+            st.warning(f"{len(rejected)} rows have errors. Nothing was saved; fix them and submit again.")
+            st.dataframe(rejected)
+        elif transactions.empty:
+            st.warning("There are no rows to submit.")
+        else:
+            st.success(f"Successfully recorded {len(transactions)} rows.")
+            copy_files()
+
+@timed()
+def handle_low_stock():
+    """List products at risk of running out, from usage velocity over the recent history."""
+    st.title("Low Stock")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        window_days = st.number_input("Usage window (days):", min_value=1, value=forecast.DEFAULT_WINDOW_DAYS)
+    with col2:
+        lead_time_days = st.number_input("Supplier lead time (days):", min_value=0, value=forecast.DEFAULT_LEAD_TIME_DAYS)
+    with col3:
+        review_days = st.number_input("Days between orders:", min_value=0, value=forecast.DEFAULT_REVIEW_DAYS)
+    show_all = st.checkbox("Show all products")
+
+    # The daily rollup is kept up to date on every append, so this never scans the full log
+    transaction_store.get_connection(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+    since = pd.Timestamp(datetime.today()).normalize() - pd.Timedelta(days=window_days - 1)
+    usage = transaction_store.load_usage_window(INVENTORY_CATALOG_STORE, since)
+    master_data = load_or_create_file(MASTER_DATA_FILE, MASTER_COLUMNS)
+    result = forecast.forecast_stock(master_data, usage, window_days, lead_time_days, review_days)
+    if not show_all:
+        result = result[result["At Risk"]]
+
+    if result.empty:
+        st.success("No products are at risk of running out.")
+        return
+    product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
+    index = product_details_index(product_details)
+    names = {product_id: product_details["Product Name"].iat[pos] for product_id, pos in index.id_to_pos.items()}
+    result.insert(1, "Product Name", result["Product ID"].map(names))
+    st.write(f"**{int(result['At Risk'].sum())}** products are at or below their reorder point.")
+    st.dataframe(result.round(2), hide_index=True)
+
+@timed()
+def handle_stock_valuation():
+    """Value the stock on hand at FIFO lot cost and list lots nearing expiry."""
+    st.title("Stock Valuation")
+    ledger = lot_ledger.get_ledger(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+    valuation = ledger.valuation()
+
+    master_data = load_or_create_file(MASTER_DATA_FILE, MASTER_COLUMNS)
+    average = pd.DataFrame({
+        "Product ID": pd.to_numeric(master_data["Product ID"], errors="coerce"),
+        "Weighted Average Value": pd.to_numeric(master_data["Total Quantity"], errors="coerce") * pd.to_numeric(master_data["Average Price"], errors="coerce"),
+    }).dropna(subset=["Product ID"])
+    valuation = valuation.rename(columns={"Value": "FIFO Value"}).merge(average, on="Product ID", how="outer")
+
+    col1, col2 = st.columns(2)
+    col1.metric("Stock Value (FIFO)", f"₹{valuation['FIFO Value'].sum():,.2f}")
+    col2.metric("Stock Value (Weighted Average)", f"₹{valuation['Weighted Average Value'].sum():,.2f}")
+    st.dataframe(valuation.round(2), hide_index=True)
+
+    st.write("### Lots Nearing Expiry")
+    days = st.number_input("Expiring within (days):", min_value=0, value=7)
+    lots = ledger.lots()
+    cutoff = pd.Timestamp(datetime.today()).normalize() + pd.Timedelta(days=days)
+    expiring = lots[lots["Expiry Date"].notna() & (lots["Expiry Date"] <= cutoff)].sort_values("Expiry Date")
+    if expiring.empty:
+        st.success("No lots expire in that period.")
     else:
-        df = pd.DataFrame(columns=columns)
-        save_to_file(file_path, df)  # Save empty DataFrame if file doesn't exist
-        return df
+        st.dataframe(expiring, hide_index=True)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_consolidated_view(data_dir, signature):
+    """Read every branch's shard in parallel; signature (the shards' mtimes) keys the cache."""
+    return branches.consolidated_view(config.Paths(data_dir))
+
+@timed()
+def handle_all_branches():
+    """Show stock and prices consolidated across every branch."""
+    st.title("All Branches")
+    st.caption(f"This terminal works for: {paths.branch or 'Main (single shop)'}")
+    consolidated, by_branch = load_consolidated_view(paths.data_dir, branches.shard_signature(paths))
+    if consolidated.empty:
+        st.info("No branch has any stock yet.")
+        return
+    product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
+    names = product_details[["Product ID", "Product Name"]].assign(**{
+        "Product ID": pd.to_numeric(product_details["Product ID"], errors="coerce")
+    })
+    st.write("### Consolidated Stock")
+    st.dataframe(names.merge(consolidated, on="Product ID", how="right").round(2), hide_index=True)
+    st.write("### Stock by Branch")
+    st.dataframe(names.merge(by_branch, on="Product ID", how="right"), hide_index=True)
+
+@timed()
+def handle_master_data_health():
+    """Check master_data against the inventory catalog and rebuild it when it has drifted."""
+    st.title("Master Data Health")
+    st.write("Master data is derived from the inventory catalog. Check it for drift or rebuild it from the full history.")
+    check_button = st.button("Check Consistency")
+    rebuild_button = st.button("Rebuild Master Data")
+
+    if check_button:
+        transaction_store.get_connection(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+        catalog = transaction_store.load_transactions(INVENTORY_CATALOG_STORE)
+        master_data = load_or_create_file(MASTER_DATA_FILE, MASTER_COLUMNS)
+        drift = master_view.check_consistency(master_data, catalog)
+        if drift.empty:
+            st.success("Master data matches the inventory catalog.")
+        else:
+            st.warning(f"Found {len(drift)} values that differ from the inventory catalog across {drift['Product ID'].nunique()} products.")
+            st.dataframe(drift)
+    if rebuild_button:
+        # Under the write lock, so a transaction from another terminal can't land between the read and the save
+        master_data, catalog = rebuild_master_data()
+        st.success(f"Rebuilt master data for {len(master_data)} products from {len(catalog)} transactions.")
+        copy_files()
 
-def save_to_file(file_path, df):
-    """Save the DataFrame to the specified file path."""
-    with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False)
+@timed()
+def handle_analytics():
+    """Show consumption and purchase charts per product from the pre-aggregated rollups."""
+    import analytics  # Pulls in matplotlib/seaborn only when this page is opened
+
+    st.title("Analytics")
+    scope = st.radio("Show", ["One Product", "All Products"])
+    product_id = None
+    title = "All products"
+    if scope == "One Product":
+        search_input, search_by = product_search_input("analytics")
+        if not search_input:
+            return
+        product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
+        product = search_product_in_details(search_input, search_by, product_details)
+        if product.empty:
+            st.error("Product not found. Please try again.")
+            return
+        product_id = int(product["Product ID"].iloc[0])
+        title = f"{product['Product Name'].iloc[0]} (ID {product_id})"
+
+    granularity = st.radio("Period", list(analytics.GRANULARITIES), horizontal=True)
+    metric = st.selectbox("Metric", list(analytics.METRICS))
+
+    transaction_store.get_connection(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+    version = transaction_store.store_version(INVENTORY_CATALOG_STORE)
+    st.image(analytics.render_chart(INVENTORY_CATALOG_STORE, product_id, granularity, metric, f"{metric} - {title}", version))
+    st.dataframe(analytics.summary_table(INVENTORY_CATALOG_STORE, product_id, granularity, version))
+
+@timed()
+def handle_export_catalog():
+    """Export the inventory catalog store to the xlsx workbook for the accountants."""
+    st.title("Export Inventory Catalog")
+    st.write(f"The full transaction history will be written to `{INVENTORY_CATALOG_FILE}`.")
+    if st.button("Export to Excel"):
+        transaction_store.get_connection(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+        row_count = transaction_store.export_to_excel(INVENTORY_CATALOG_STORE, INVENTORY_CATALOG_FILE)
+        st.success(f"Exported {row_count} transactions to {INVENTORY_CATALOG_FILE}.")
+        copy_files()
+
+@st.cache_resource
+def load_logo(logo_path):
+    """Read the logo image once per server process instead of on every rerun."""
+    with open(logo_path, "rb") as f:
+        return f.read()
 
 def add_logo():
     """Display a logo in the top right corner."""
-    logo_path = r"D:\Sri Divyam Inventory Application\photo\sridhivyum logo.jpg" 
     # Use columns to position the logo
     col1, col2 = st.columns([8, 1])  # Adjust column widths
     with col1:
         st.empty()  # Leave the left side empty
     with col2:
-        st.image(logo_path, use_container_width=True)  # Display the logo in the right column
+        st.image(load_logo(LOGO_FILE), use_container_width=True)  # Display the logo in the right column
+@timed()
 def handle_factory_usage():
     """Handle factory usage and update inventory."""
     st.title("Factory Usage - Deduct Inventory")
     
-    # Ask user to search for a product by Name or ID
-    search_by = st.radio("Search By", ["Product Name", "Product ID"])
-    search_input = st.text_input(f"Enter {search_by}:")
+    # Search for a product by Name, ID or typeahead
+    search_input, search_by = product_search_input("factory_usage")
     
     if search_input:
         # Load product details
@@ -396,18 +427,16 @@ def handle_factory_usage():
             st.write(f"**Product ID:** {product_details_row['Product ID']}")
             
             # Load master data to check current stock
-            master_data = load_or_create_file(MASTER_DATA_FILE, [
-                "Product ID", "Total Quantity", 
-                "Average Price", "Latest Price", "Highest Price", 
-                "Lowest Price", "Latest Purchase Date"
-            ])
+            master_data = load_or_create_file(MASTER_DATA_FILE, MASTER_COLUMNS)
             
-            product_in_master = master_data[master_data["Product ID"] == product_details_row["Product ID"]]
+            product_in_master = search_product_in_master(product_details_row["Product ID"], "Product ID", master_data)
 
             if not product_in_master.empty:
                 available_quantity = product_in_master["Total Quantity"].values[0]
                 st.write(f"**Available Quantity:** {available_quantity} units")
             
+            costing_method = st.radio("Costing Method", lot_ledger.COSTING_METHODS, index=lot_ledger.COSTING_METHODS.index(lot_ledger.default_costing_method()), horizontal=True)
+
             # Form to input quantity used and the date
             with st.form(key="factory_usage_form"):
                 quantity_used = st.number_input("Enter Quantity Used:", min_value=0.01, format="%.2f")
@@ -421,42 +450,74 @@ def handle_factory_usage():
                         st.warning("Insufficient quantity in stock!")
                     else:
                         # Log the factory usage and update master_data
-                        inventory_catalog = load_or_create_file(INVENTORY_CATALOG_FILE, [
-                            "Product ID", "Quantity Added", "Total Cost", "Purchase Date", "Timestamp"
-                        ])
-                        
-                        # Calculate the cost based on available price in master_data
-                        avg_price = product_in_master["Average Price"].values[0] if not product_in_master.empty else 0
-                        total_cost = quantity_used * avg_price
+                        if costing_method == "FIFO":
+                            # Cost the usage against the oldest purchase lots still in stock
+                            ledger = lot_ledger.get_ledger(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+                            total_cost = ledger.peek_cost(product_details_row["Product ID"], quantity_used)
+                        else:
+                            # Calculate the cost based on available price in master_data
+                            avg_price = product_in_master["Average Price"].values[0] if not product_in_master.empty else 0
+                            total_cost = quantity_used * avg_price
                         
                         # Log the transaction as a negative quantity for usage
-                        log_inventory_transaction(product_details_row["Product ID"], -quantity_used, total_cost, usage_date, inventory_catalog, master_data)
+                        log_inventory_transaction(product_details_row["Product ID"], -quantity_used, total_cost, usage_date)
                         
                         st.success(f"Successfully deducted {quantity_used} units from {product_details_row['Product Name']} inventory.")
+                        copy_files()
 
 
 
 # Main App
+def show_timings():
+    """Show this rerun's timing breakdown in a collapsed sidebar panel (only with INVENTORY_TIMING=1)."""
+    records, total = instrumentation.end_run()
+    if not instrumentation.ENABLED:
+        return
+    timings = pd.DataFrame(records, columns=["name", "ms", "rows", "depth"])
+    # Whatever the timed calls don't account for is Streamlit rendering and untimed code
+    other = total * 1000 - timings.loc[timings["depth"] == 0, "ms"].sum()
+    with st.sidebar.expander(f"Timings: {total * 1000:.0f} ms this rerun"):
+        st.dataframe(pd.DataFrame({
+            "Step": ["\u2003" * depth + name.split(".")[-1] for name, depth in zip(timings["name"], timings["depth"])],
+            "ms": timings["ms"],
+            "Rows": timings["rows"].astype("Int64"),
+        }), hide_index=True)
+        st.caption(f"Rendering and untimed code: {other:.1f} ms. Log: {instrumentation.LOG_FILE}")
+
 def main():
+    instrumentation.begin_run()
+    # Finish any write a crashed terminal left half-applied before reading data
+    if recover_interrupted_writes(on_failure=st.warning):
+        copy_files()
     add_logo()
     # Sidebar options using a radio button
-    option = st.sidebar.radio("Choose an action", ["Add New Product", "Add Quantity", "Factory Usage", "Search a Product", "Rename Product"])
+    option = st.sidebar.radio("Choose an action", ["Add New Product", "Add Quantity", "Factory Usage", "Search a Product", "Rename Product", "Batch Entry", "Analytics", "Low Stock", "Stock Valuation", "All Branches", "Master Data Health", "Export Inventory Catalog"])
 
     if option == "Add New Product":
         handle_new_product()
-        copy_files()
     elif option == "Add Quantity":
         handle_add_quantity()
-        copy_files()
     elif option == "Factory Usage":
         handle_factory_usage()
-        copy_files()  # This will be the new function
     elif option == "Search a Product":
         handle_search_product()
-        copy_files()
     elif option == "Rename Product":
         handle_rename_product()
-        copy_files()
+    elif option == "Batch Entry":
+        handle_batch_entry()
+    elif option == "Analytics":
+        handle_analytics()
+    elif option == "Low Stock":
+        handle_low_stock()
+    elif option == "Stock Valuation":
+        handle_stock_valuation()
+    elif option == "All Branches":
+        handle_all_branches()
+    elif option == "Master Data Health":
+        handle_master_data_health()
+    elif option == "Export Inventory Catalog":
+        handle_export_catalog()
+    show_timings()
 
 if __name__ == "__main__":
     main()
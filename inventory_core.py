@@ -0,0 +1,267 @@
+"""Inventory operations shared by the Streamlit app (inventory.py) and the
+HTTP service (service.py). Nothing here depends on Streamlit."""
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import backup
+import config
+import master_view
+import product_search
+import storage
+import transaction_store
+import write_coordinator
+from master_view import MASTER_COLUMNS
+from instrumentation import timed
+from product_index import master_data_index, product_details_index
+from storage import load_or_create_file, save_to_file
+
+# A write takes a snapshot at most once an hour; snapshots are kept for 30 days
+SNAPSHOT_INTERVAL = timedelta(hours=1)
+SNAPSHOT_RETENTION = timedelta(days=30)
+
+def configure(data_dir=None, branch=None):
+    """Point the inventory operations at a data folder and branch (by default, the configured ones)."""
+    global paths, PRODUCT_DETAILS_FILE, MASTER_DATA_FILE, INVENTORY_CATALOG_FILE, INVENTORY_CATALOG_STORE
+    global data_base_folder, backup_folder, backup_2_folder, snapshot_folder, coordinator, product_coordinator
+    paths = config.load_paths(data_dir, branch)
+    # File paths: the product master is shared, master_data and the catalog belong to the branch
+    PRODUCT_DETAILS_FILE = paths.product_details_file
+    MASTER_DATA_FILE = paths.master_data_file
+    INVENTORY_CATALOG_FILE = paths.inventory_catalog_file
+    INVENTORY_CATALOG_STORE = paths.inventory_catalog_store
+    data_base_folder = paths.data_base_folder
+    backup_folder = paths.backup_folder
+    backup_2_folder = paths.backup_2_folder
+    snapshot_folder = paths.snapshot_folder
+    # Branch writes only lock their own shard; product master changes lock the shared folder
+    coordinator = write_coordinator.WriteCoordinator(paths.branch_folder)
+    product_coordinator = coordinator if not paths.branch else write_coordinator.WriteCoordinator(paths.data_base_folder)
+    return paths
+
+configure()
+
+def files_to_copy():
+    """Return the data files to back up for the selected storage backend."""
+    backend = storage.get_backend()
+    return sorted({
+        backend.path_for(PRODUCT_DETAILS_FILE),
+        backend.path_for(MASTER_DATA_FILE),
+        INVENTORY_CATALOG_FILE,
+        INVENTORY_CATALOG_STORE
+    })
+
+@timed()
+def copy_files():
+    """Back up changed data files to backup and backup_2, and to a timestamped snapshot once an hour.
+
+    The copy runs on a background thread, so call this only after a write.
+    """
+    backup.request_backup(files_to_copy(), [backup_folder, backup_2_folder], snapshot_folder, SNAPSHOT_RETENTION,
+                          append_only=[INVENTORY_CATALOG_STORE], snapshot_interval=SNAPSHOT_INTERVAL)
+
+@contextmanager
+def all_locked():
+    """Hold the write locks on the branch and the shared product master, e.g. while restoring a snapshot."""
+    with coordinator.locked():
+        if product_coordinator is coordinator:
+            yield
+        else:
+            with product_coordinator.locked():
+                yield
+
+# Helper Functions
+def generate_product_id(product_details):
+    """Generate the next product ID (01, 02, 03, ...) from the index's running maximum."""
+    return product_details_index(product_details).max_id + 1
+
+def validate_product_name(product_name, product_details):
+    """Check if the product name is valid and unique."""
+    if product_name.strip() == "":
+        return "empty"
+    if product_details_index(product_details).has_name(product_name):
+        return "exists"
+    return "valid"
+
+@timed()
+def add_new_product(product_name):
+    """Add a new product to product_details under the write lock; returns the new ID."""
+    product_name_lower = product_name.strip().lower()
+    with product_coordinator.locked():
+        # Re-read inside the lock so two terminals never hand out the same ID
+        product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
+        if validate_product_name(product_name, product_details) == "exists":
+            raise ValueError(f"The product '{product_name}' already exists!")
+        new_id = int(generate_product_id(product_details))
+        
+        new_product = {
+            "Product Name": product_name_lower,
+            "Product ID": new_id
+        }
+        with product_coordinator.journal("add_product", new_product):
+            index = product_details_index(product_details)
+            new_product_details = pd.concat([product_details, pd.DataFrame([new_product])], ignore_index=True)
+            index.add(new_product_details, new_id, product_name_lower)
+            product_search.product_added(product_details, new_product_details, new_id, product_name_lower)
+            save_to_file(PRODUCT_DETAILS_FILE, new_product_details)
+    return new_id
+
+@timed()
+def search_product_in_details(search_input, search_by, product_details):
+    """Search for a product by name or ID in product_details.xlsx."""
+    index = product_details_index(product_details)
+    if search_by == "Product Name":
+        return index.rows_for_id(index.id_for_name(search_input))
+    elif search_by == "Product ID":
+        return index.rows_for_id(search_input)
+    return pd.DataFrame()
+
+@timed()
+def search_product_in_master(search_input, search_by, master_data):
+    """Search for a product by name or ID in master_data."""
+    if search_by in ("Product Name", "Product ID"):
+        return master_data_index(master_data).rows_for_id(search_input)
+    return pd.DataFrame()
+
+@timed()
+def log_inventory_transaction(product_id, quantity, total_cost, purchase_date, expiry_date=None):
+    """Append the transaction to the inventory catalog store with timestamp and update master_data."""
+    timestamp = datetime.now()  # Get the current timestamp
+    transaction = {
+        "Product ID": product_id,
+        "Quantity Added": quantity,  # Quantity should be negative for factory usage
+        "Total Cost": total_cost,
+        "Purchase Date": purchase_date,
+        "Timestamp": timestamp,
+        "Expiry Date": expiry_date  # Optional, tracked per purchase lot
+    }
+    transaction_store.to_rows([transaction])  # Reject unreadable values before they reach the journal
+    
+    with coordinator.locked(), coordinator.journal("transactions", [transaction]):
+        # Append the transaction to the catalog store (one row written, not the whole history)
+        transaction_store.get_connection(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+        transaction_store.append_transaction(INVENTORY_CATALOG_STORE, transaction)
+
+        # Maintain the master_data view for the new row, on the latest copy from disk
+        master_data = load_or_create_file(MASTER_DATA_FILE, MASTER_COLUMNS)
+        master_data = master_view.apply_transaction(master_data, transaction)
+
+        # Save the updated master_data
+        save_to_file(MASTER_DATA_FILE, master_data)
+
+@timed()
+def log_inventory_batch(transactions):
+    """Append a batch of validated transactions in one write and update master_data once."""
+    with coordinator.locked():
+        _log_inventory_batch(transactions)
+
+def _log_inventory_batch(transactions):
+    """log_inventory_batch for a caller that already holds coordinator.locked()."""
+    transactions = transactions.assign(Timestamp=datetime.now())
+    records = transactions.to_dict("records")
+    transaction_store.to_rows(records)  # Reject unreadable values before they reach the journal
+    with coordinator.journal("transactions", records):
+        transaction_store.get_connection(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+        transaction_store.append_transactions(INVENTORY_CATALOG_STORE, records)
+
+        master_data = load_or_create_file(MASTER_DATA_FILE, MASTER_COLUMNS)
+        master_data = master_view.apply_transactions(master_data, transactions)
+        save_to_file(MASTER_DATA_FILE, master_data)
+
+@timed()
+def validate_and_log_batch(validate):
+    """Validate a batch against the current stock and log it, under one write lock.
+
+    validate(product_details, master_data) returns (transactions, result);
+    the transactions are logged and result is returned. Checking stock inside
+    the lock means another terminal's usage can't land between the check and
+    the write and take the stock below zero.
+    """
+    with coordinator.locked():
+        product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
+        master_data = load_or_create_file(MASTER_DATA_FILE, MASTER_COLUMNS)
+        transactions, result = validate(product_details, master_data)
+        if not transactions.empty:
+            _log_inventory_batch(transactions)
+    return result
+
+@timed()
+def rename_product(product_id, new_name):
+    """Rename an existing product in product_details under the write lock."""
+    product_id = int(product_id)  # Ensure product_id is treated as integer
+    with product_coordinator.locked():
+        product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
+        index = product_details_index(product_details)
+        # Search for the product by ID
+        pos = index.position(product_id)
+        
+        if pos is None:
+            return "Product not found"
+        
+        # Check if new name already exists
+        if index.has_name(new_name):
+            return "Product name already exists"
+        
+        # Update the product name
+        with product_coordinator.journal("rename_product", {"Product ID": product_id, "Product Name": new_name.strip().lower()}):
+            name_column = product_details.columns.get_loc("Product Name")
+            old_name = product_details.iat[pos, name_column]
+            product_details.iat[pos, name_column] = new_name.strip().lower()
+            index.rename(product_id, old_name, new_name)
+            product_search.product_renamed(product_details, product_id, new_name)
+            save_to_file(PRODUCT_DETAILS_FILE, product_details)
+    return "Product renamed successfully"
+
+def _rebuild_master_data():
+    """Derive master_data again from the whole catalog and save it; returns (master_data, catalog)."""
+    transaction_store.get_connection(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+    catalog = transaction_store.load_transactions(INVENTORY_CATALOG_STORE)
+    master_data = master_view.rebuild_master_data(catalog)
+    save_to_file(MASTER_DATA_FILE, master_data)
+    return master_data, catalog
+
+@timed()
+def rebuild_master_data():
+    """Rebuild master_data from the catalog under the write lock; returns (master_data, catalog)."""
+    with coordinator.locked(), coordinator.journal("rebuild_master_data", {}):
+        return _rebuild_master_data()
+
+def replay_journal_entry(kind, payload):
+    """Finish a write that was interrupted part-way; safe to run more than once."""
+    if kind == "transactions":
+        transaction_store.get_connection(INVENTORY_CATALOG_STORE, legacy_file=INVENTORY_CATALOG_FILE)
+        if not transaction_store.contains_transaction(INVENTORY_CATALOG_STORE, payload[0]):
+            transaction_store.append_transactions(INVENTORY_CATALOG_STORE, payload)
+        # master_data may or may not include the rows, so derive it again from the catalog
+        _rebuild_master_data()
+    elif kind == "rebuild_master_data":
+        _rebuild_master_data()
+    elif kind == "add_product":
+        product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
+        if product_details_index(product_details).position(payload["Product ID"]) is None:
+            new_product = {"Product Name": payload["Product Name"], "Product ID": int(payload["Product ID"])}
+            product_details = pd.concat([product_details, pd.DataFrame([new_product])], ignore_index=True)
+            save_to_file(PRODUCT_DETAILS_FILE, product_details)
+    elif kind == "rename_product":
+        product_details = load_or_create_file(PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
+        pos = product_details_index(product_details).position(payload["Product ID"])
+        if pos is not None:
+            product_details = product_details.copy()
+            product_details.iat[pos, product_details.columns.get_loc("Product Name")] = payload["Product Name"]
+            save_to_file(PRODUCT_DETAILS_FILE, product_details)
+
+def recover_interrupted_writes(on_failure=print):
+    """Replay the journal entries a crashed terminal left behind; returns True if anything was replayed.
+
+    An entry that fails to replay is moved aside and reported with
+    on_failure(message) instead of raising on every start.
+    """
+    recovered = False
+    coordinators = [coordinator] if product_coordinator is coordinator else [coordinator, product_coordinator]
+    for journal_coordinator in coordinators:
+        try:
+            recovered = journal_coordinator.recover(replay_journal_entry) is not None or recovered
+        except write_coordinator.ReplayError as e:
+            on_failure(f"{e} Check the data, e.g. with Master Data Health.")
+        except TimeoutError:
+            pass  # Another terminal is writing; its entry is not a crash, so try again on the next start
+    return recovered
@@ -0,0 +1,188 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+import transaction_store
+
+# Costing methods offered for factory usage; the default comes from INVENTORY_COSTING_METHOD
+COSTING_METHODS = ["Weighted Average", "FIFO"]
+EPSILON = 1e-9
+
+_ledgers = {}
+_lock = threading.Lock()
+
+
+def default_costing_method():
+    """Return the costing method selected by INVENTORY_COSTING_METHOD ("average" or "fifo")."""
+    return "FIFO" if os.environ.get("INVENTORY_COSTING_METHOD", "").lower() == "fifo" else "Weighted Average"
+
+
+class ProductLots:
+    """Purchase lots of one product in parallel NumPy arrays, oldest first.
+
+    Lots before head are fully consumed. Consumption moves head forward, so
+    each lot is visited once over its lifetime; the arrays are compacted when
+    they fill up. Usage beyond the lots on hand is kept as a shortfall that
+    the next purchase pays back before it becomes a lot.
+    """
+    __slots__ = ("remaining", "unit_cost", "purchase_date", "expiry_date", "head", "size", "shortfall")
+
+    def __init__(self, capacity=8):
+        self.remaining = np.zeros(capacity)
+        self.unit_cost = np.zeros(capacity)
+        self.purchase_date = np.full(capacity, np.datetime64("NaT"), dtype="datetime64[D]")
+        self.expiry_date = np.full(capacity, np.datetime64("NaT"), dtype="datetime64[D]")
+        self.head = 0
+        self.size = 0
+        self.shortfall = 0.0
+
+    def _reserve(self):
+        """Make room for one more lot, dropping consumed lots and doubling capacity if needed."""
+        if self.size < len(self.remaining):
+            return
+        live = self.size - self.head
+        capacity = max(8, live * 2)
+        for name in ("remaining", "unit_cost", "purchase_date", "expiry_date"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:live] = old[self.head:self.size]
+            setattr(self, name, new)
+        self.head = 0
+        self.size = live
+
+    def add(self, quantity, unit_cost, purchase_date, expiry_date=None):
+        """Record a purchase lot, keeping lots ordered by purchase date."""
+        if self.shortfall > EPSILON:
+            # Stock was used before it was bought; only what is left over goes into a lot
+            settled = min(self.shortfall, quantity)
+            self.shortfall -= settled
+            quantity -= settled
+            if quantity <= EPSILON:
+                return
+        self._reserve()
+        purchase_date = np.datetime64(pd.Timestamp(purchase_date).date(), "D")
+        expiry_date = np.datetime64("NaT", "D") if pd.isna(expiry_date) else np.datetime64(pd.Timestamp(expiry_date).date(), "D")
+        pos = self.size
+        if self.size > self.head and purchase_date < self.purchase_date[self.size - 1]:
+            # Back-dated purchase: slot it in by date (binary search, then shift the newer lots)
+            pos = self.head + int(np.searchsorted(self.purchase_date[self.head:self.size], purchase_date, side="right"))
+            for array in (self.remaining, self.unit_cost, self.purchase_date, self.expiry_date):
+                array[pos + 1:self.size + 1] = array[pos:self.size].copy()
+        self.remaining[pos] = quantity
+        self.unit_cost[pos] = unit_cost
+        self.purchase_date[pos] = purchase_date
+        self.expiry_date[pos] = expiry_date
+        self.size += 1
+
+    def _walk(self, quantity, consume):
+        """Cost quantity against the oldest lots, drawing them down if consume is set."""
+        cost = 0.0
+        pos = self.head
+        while quantity > EPSILON and pos < self.size:
+            take = min(self.remaining[pos], quantity)
+            cost += take * self.unit_cost[pos]
+            quantity -= take
+            if consume:
+                self.remaining[pos] -= take
+            if self.remaining[pos] <= EPSILON or not consume:
+                pos += 1
+        if consume:
+            self.head = pos
+            if quantity > EPSILON:
+                self.shortfall += quantity
+        if quantity > EPSILON and self.size:
+            cost += quantity * self.unit_cost[self.size - 1]  # More used than purchased: price at the latest lot
+        return cost
+
+    def consume(self, quantity):
+        """Draw quantity from the oldest lots; returns its FIFO cost."""
+        return self._walk(quantity, consume=True)
+
+    def peek_cost(self, quantity, already_used=0):
+        """Return the FIFO cost of using quantity after already_used, without changing the lots."""
+        return self._walk(already_used + quantity, consume=False) - self._walk(already_used, consume=False)
+
+    def live(self):
+        """Return the slice of lots that still hold stock."""
+        return slice(self.head, self.size)
+
+
+class LotLedger:
+    """Per-product FIFO lots derived from the transaction store.
+
+    The ledger remembers the last store row it applied and catches up on
+    newer rows (from this or any other terminal) on every sync().
+    """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self.products = {}
+        self.last_row_id = 0
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """Apply rows appended to the store since the last sync."""
+        with self._lock:
+            rows = transaction_store.load_rows_since(self.store_path, self.last_row_id)
+            for row in rows.itertuples(index=False):
+                product_id, quantity, total_cost = int(row[1]), float(row[2]), row[3]
+                lots = self.products.get(product_id)
+                if lots is None:
+                    lots = self.products[product_id] = ProductLots()
+                if quantity > 0:
+                    lots.add(quantity, (total_cost or 0) / quantity, row[4], row[5])
+                elif quantity < 0:
+                    lots.consume(-quantity)
+            if not rows.empty:
+                self.last_row_id = int(rows["Row ID"].iloc[-1])
+        return self
+
+    def peek_cost(self, product_id, quantity, already_used=0):
+        """Return the FIFO cost of using quantity of a product (after already_used), without consuming it."""
+        lots = self.products.get(int(product_id))
+        return 0.0 if lots is None else lots.peek_cost(quantity, already_used)
+
+    def _live_columns(self):
+        """Concatenate every product's live lots into flat arrays in one pass."""
+        product_ids = list(self.products)
+        slices = [self.products[product_id].live() for product_id in product_ids]
+        counts = np.array([s.stop - s.start for s in slices], dtype=int)
+        ids = np.repeat(np.array(product_ids, dtype=int), counts)
+
+        def column(name):
+            arrays = [getattr(self.products[product_id], name)[s] for product_id, s in zip(product_ids, slices)]
+            return np.concatenate(arrays) if arrays else np.array([])
+
+        return ids, column("remaining"), column("unit_cost"), column("purchase_date"), column("expiry_date")
+
+    def valuation(self):
+        """Value the remaining stock of every product at FIFO lot cost."""
+        ids, remaining, unit_cost, _, _ = self._live_columns()
+        value = remaining * unit_cost
+        df = pd.DataFrame({"Product ID": ids, "Quantity": remaining, "Value": value})
+        return df.groupby("Product ID", as_index=False).sum()
+
+    def lots(self):
+        """Return every lot that still holds stock."""
+        ids, remaining, unit_cost, purchase_date, expiry_date = self._live_columns()
+        return pd.DataFrame({
+            "Product ID": ids,
+            "Purchase Date": purchase_date.astype("datetime64[ns]") if len(ids) else pd.Series(dtype="datetime64[ns]"),
+            "Expiry Date": expiry_date.astype("datetime64[ns]") if len(ids) else pd.Series(dtype="datetime64[ns]"),
+            "Remaining Quantity": remaining,
+            "Unit Cost": unit_cost,
+        })
+
+
+def get_ledger(store_path, legacy_file=None):
+    """Return the process-wide ledger for a store, synced with its latest rows.
+
+    Pass the legacy catalog workbook so a store opened here for the first
+    time still imports its history.
+    """
+    transaction_store.get_connection(store_path, legacy_file=legacy_file)
+    with _lock:
+        ledger = _ledgers.get(store_path)
+        if ledger is None:
+            ledger = _ledgers[store_path] = LotLedger(store_path)
+    return ledger.sync()
@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+from product_index import master_data_index
+
+# master_data is a materialized view over the inventory catalog. Most columns are
+# decomposable aggregates, so they can be rebuilt with one groupby or maintained
+# per transaction. The Average Price is a moving average of the stock on hand:
+# a purchase re-weights it against the quantity in stock, and usage takes stock
+# out at the current average without changing it. It depends on the order of
+# the rows, so a rebuild replays each product's rows in the order they were
+# logged. "Purchased Quantity" and "Purchase Cost" are lifetime totals.
+MASTER_COLUMNS = [
+    "Product ID", "Total Quantity",
+    "Average Price", "Latest Price", "Highest Price",
+    "Lowest Price", "Latest Purchase Date",
+    "Purchased Quantity", "Purchase Cost"
+]
+PRICE_COLUMNS = ["Total Quantity", "Average Price", "Latest Price", "Highest Price", "Lowest Price", "Purchased Quantity", "Purchase Cost"]
+
+
+def aggregate_transactions(transactions):
+    """Aggregate catalog rows per Product ID into master_data columns."""
+    transactions = transactions.assign(**{
+        "Product ID": pd.to_numeric(transactions["Product ID"]).astype(int),
+        "Purchase Date": pd.to_datetime(transactions["Purchase Date"]),
+    })
+    sort_columns = ["Purchase Date"] + (["Timestamp"] if "Timestamp" in transactions.columns else [])
+    purchases = transactions[transactions["Quantity Added"] > 0].sort_values(sort_columns, kind="stable")
+    unit_price = purchases["Total Cost"] / purchases["Quantity Added"]
+    grouped = unit_price.groupby(purchases["Product ID"])
+
+    aggregates = pd.DataFrame({
+        "Total Quantity": transactions.groupby("Product ID")["Quantity Added"].sum(),
+        "Purchased Quantity": purchases.groupby("Product ID")["Quantity Added"].sum(),
+        "Purchase Cost": purchases.groupby("Product ID")["Total Cost"].sum(),
+        "Latest Price": grouped.last(),
+        "Highest Price": grouped.max(),
+        "Lowest Price": grouped.min(),
+        "Latest Purchase Date": purchases.groupby("Product ID")["Purchase Date"].last(),
+    })
+    aggregates[["Purchased Quantity", "Purchase Cost"]] = aggregates[["Purchased Quantity", "Purchase Cost"]].fillna(0)
+    aggregates.index.name = "Product ID"
+    return aggregates
+
+
+def _numeric(master_data, column):
+    return pd.to_numeric(master_data[column], errors="coerce")
+
+
+def _moved_average(on_hand, average, quantity, total_cost):
+    """Return the average price after buying quantity for total_cost with on_hand in stock."""
+    if on_hand > 0 and not pd.isna(average):
+        return (on_hand * average + total_cost) / (on_hand + quantity)
+    return total_cost / quantity  # Nothing (or less than nothing) left to weigh against
+
+
+def moving_average_prices(transactions, master_data=None):
+    """Replay catalog rows in the order they were logged; returns the Average Price per Product ID.
+
+    Starts from master_data's Total Quantity and Average Price for products
+    that are already there. Products without a purchase are left out.
+    """
+    product_ids = pd.to_numeric(transactions["Product ID"]).astype(int)
+    on_hand = {}
+    average = {}
+    if master_data is not None and not master_data.empty:
+        ids = _numeric(master_data, "Product ID")
+        rows = ids.isin(product_ids.unique()) & ~ids.duplicated()
+        quantities = _numeric(master_data, "Total Quantity")[rows].fillna(0)
+        prices = _numeric(master_data, "Average Price")[rows]
+        for product_id, quantity, price in zip(ids[rows].astype(int).tolist(), quantities.tolist(), prices.tolist()):
+            on_hand[product_id] = quantity
+            if not pd.isna(price):
+                average[product_id] = price
+
+    quantities = pd.to_numeric(transactions["Quantity Added"]).tolist()
+    costs = pd.to_numeric(transactions["Total Cost"]).tolist()
+    for product_id, quantity, total_cost in zip(product_ids.tolist(), quantities, costs):
+        stock = on_hand.get(product_id, 0.0)
+        if quantity > 0:
+            average[product_id] = _moved_average(stock, average.get(product_id), quantity, total_cost)
+        on_hand[product_id] = stock + quantity
+    return pd.Series(average, dtype=float)
+
+
+def _purchase_totals(master_data):
+    """Return (Purchased Quantity, Purchase Cost), estimating them for rows written before they existed."""
+    purchased = _numeric(master_data, "Purchased Quantity")
+    cost = _numeric(master_data, "Purchase Cost")
+    legacy = purchased.isna()
+    estimated = _numeric(master_data, "Total Quantity").clip(lower=0).fillna(0)
+    purchased = purchased.mask(legacy, estimated)
+    cost = cost.mask(legacy, estimated * _numeric(master_data, "Average Price").fillna(0))
+    return purchased, cost
+
+
+def merge_aggregates(master_data, aggregates):
+    """Fold per-product aggregates into master_data; returns the new table.
+
+    aggregates comes from aggregate_transactions, with an "Average Price"
+    column from moving_average_prices.
+    """
+    master_data = master_data.copy()
+    for column in MASTER_COLUMNS:
+        if column not in master_data.columns:
+            master_data[column] = None
+    ids = _numeric(master_data, "Product ID")
+    rows = ids.isin(aggregates.index) & ~ids.duplicated()
+
+    if rows.any():
+        changes = aggregates.reindex(ids[rows].values)
+        changes.index = master_data.index[rows]
+        old = master_data.loc[rows]
+        purchased, cost = _purchase_totals(old)
+        purchased = purchased + changes["Purchased Quantity"]
+        cost = cost + changes["Purchase Cost"]
+        old_date = pd.to_datetime(old["Latest Purchase Date"])
+        newer = changes["Latest Purchase Date"].notna() & ~(changes["Latest Purchase Date"] < old_date)
+
+        master_data.loc[rows, "Total Quantity"] = _numeric(old, "Total Quantity").fillna(0) + changes["Total Quantity"]
+        master_data.loc[rows, "Purchased Quantity"] = purchased
+        master_data.loc[rows, "Purchase Cost"] = cost
+        master_data.loc[rows, "Average Price"] = changes["Average Price"].where(changes["Average Price"].notna(), _numeric(old, "Average Price"))
+        master_data.loc[rows, "Highest Price"] = pd.concat([_numeric(old, "Highest Price"), changes["Highest Price"]], axis=1).max(axis=1)
+        master_data.loc[rows, "Lowest Price"] = pd.concat([_numeric(old, "Lowest Price"), changes["Lowest Price"]], axis=1).min(axis=1)
+        master_data.loc[rows, "Latest Price"] = changes["Latest Price"].where(newer, _numeric(old, "Latest Price"))
+        master_data.loc[rows, "Latest Purchase Date"] = changes["Latest Purchase Date"].where(newer, old_date)
+
+    new_products = aggregates[~aggregates.index.isin(ids)]
+    if not new_products.empty:
+        new_entries = new_products.reset_index()
+        master_data = pd.concat([master_data, new_entries[MASTER_COLUMNS]], ignore_index=True)
+    return master_data
+
+
+def apply_transactions(master_data, transactions):
+    """Incrementally maintain master_data for a batch of new catalog rows."""
+    if transactions.empty:
+        return master_data
+    aggregates = aggregate_transactions(transactions)
+    aggregates["Average Price"] = moving_average_prices(transactions, master_data).reindex(aggregates.index)
+    return merge_aggregates(master_data, aggregates)
+
+
+def rebuild_master_data(catalog):
+    """Recompute master_data from the full inventory catalog (rows in the order they were logged)."""
+    return apply_transactions(pd.DataFrame(columns=MASTER_COLUMNS), catalog)
+
+
+def apply_transaction(master_data, transaction):
+    """Maintain master_data for one new catalog row in O(1); returns the (possibly new) table."""
+    product_id = int(transaction["Product ID"])
+    quantity = float(transaction["Quantity Added"])
+    index = master_data_index(master_data)
+    pos = index.position(product_id)
+    if pos is None:
+        table = apply_transactions(master_data, pd.DataFrame([transaction]))
+        index.add(table, product_id)
+        return table
+
+    for column in MASTER_COLUMNS:
+        if column not in master_data.columns:
+            master_data[column] = None
+    row = master_data.iloc[[pos]]
+    idx = master_data.index[pos]
+    purchased, cost = (series.iloc[0] for series in _purchase_totals(row))
+    on_hand = _numeric(row, "Total Quantity").fillna(0).iloc[0]
+    master_data.at[idx, "Total Quantity"] = on_hand + quantity
+    master_data.at[idx, "Purchased Quantity"] = purchased
+    master_data.at[idx, "Purchase Cost"] = cost
+    if quantity <= 0:
+        return master_data  # Usage is taken out at the current average, which stays as it is
+
+    total_cost = float(transaction["Total Cost"])
+    unit_price = total_cost / quantity
+    purchase_date = pd.to_datetime(transaction["Purchase Date"])
+    master_data.at[idx, "Purchased Quantity"] = purchased + quantity
+    master_data.at[idx, "Purchase Cost"] = cost + total_cost
+    master_data.at[idx, "Average Price"] = _moved_average(on_hand, _numeric(row, "Average Price").iloc[0], quantity, total_cost)
+    master_data.at[idx, "Highest Price"] = np.nanmax([_numeric(row, "Highest Price").iloc[0], unit_price])
+    master_data.at[idx, "Lowest Price"] = np.nanmin([_numeric(row, "Lowest Price").iloc[0], unit_price])
+    latest_date = pd.to_datetime(row["Latest Purchase Date"].iloc[0])
+    if pd.isna(latest_date) or purchase_date >= latest_date:
+        master_data.at[idx, "Latest Price"] = unit_price
+        master_data.at[idx, "Latest Purchase Date"] = purchase_date
+    return master_data
+
+
+def consolidate(master_frames):
+    """Combine several branches' master_data into one view across branches.
+
+    Quantities and purchase totals add up, the average price is weighted by
+    each branch's stock on hand, and the latest price comes from the most
+    recent purchase in any branch.
+    """
+    frames = []
+    for master_data in master_frames:
+        if master_data.empty:
+            continue
+        purchased, cost = _purchase_totals(master_data)
+        quantity = _numeric(master_data, "Total Quantity")
+        average = _numeric(master_data, "Average Price")
+        in_stock = quantity.clip(lower=0).where(average.notna(), 0)
+        frames.append(pd.DataFrame({
+            "Product ID": _numeric(master_data, "Product ID"),
+            "Total Quantity": quantity,
+            "Stock In": in_stock,
+            "Stock Value": in_stock * average.fillna(0),
+            "Average Price": average,
+            "Purchased Quantity": purchased,
+            "Purchase Cost": cost,
+            "Latest Price": _numeric(master_data, "Latest Price"),
+            "Highest Price": _numeric(master_data, "Highest Price"),
+            "Lowest Price": _numeric(master_data, "Lowest Price"),
+            "Latest Purchase Date": pd.to_datetime(master_data["Latest Purchase Date"]),
+        }))
+    if not frames:
+        return pd.DataFrame(columns=MASTER_COLUMNS)
+    combined = pd.concat(frames, ignore_index=True).dropna(subset=["Product ID"])
+    combined["Product ID"] = combined["Product ID"].astype(int)
+    combined = combined.sort_values("Latest Purchase Date", kind="stable", na_position="first")
+    grouped = combined.groupby("Product ID")
+    result = pd.DataFrame({
+        "Total Quantity": grouped["Total Quantity"].sum(),
+        "Purchased Quantity": grouped["Purchased Quantity"].sum(),
+        "Purchase Cost": grouped["Purchase Cost"].sum(),
+        "Latest Price": grouped["Latest Price"].last(),
+        "Highest Price": grouped["Highest Price"].max(),
+        "Lowest Price": grouped["Lowest Price"].min(),
+        "Latest Purchase Date": grouped["Latest Purchase Date"].max(),
+    })
+    stock_in = grouped["Stock In"].sum()
+    # Out of stock everywhere: keep the average of the branch that bought last
+    result["Average Price"] = (grouped["Stock Value"].sum() / stock_in).where(stock_in > 0, grouped["Average Price"].last())
+    return result.reset_index()[MASTER_COLUMNS]
+
+
+def check_consistency(master_data, catalog, tolerance=1e-6):
+    """Compare master_data with a fresh rebuild from the catalog.
+
+    Returns one row per drifted value: Product ID, Column, Stored, Expected.
+    """
+    expected = rebuild_master_data(catalog)
+    stored = master_data.copy()
+    stored["Product ID"] = _numeric(stored, "Product ID")
+    stored = stored.dropna(subset=["Product ID"]).drop_duplicates("Product ID").set_index("Product ID")
+    expected = expected.set_index(_numeric(expected, "Product ID"))
+    all_ids = stored.index.union(expected.index)
+    stored = stored.reindex(all_ids)
+    expected = expected.reindex(all_ids)
+
+    drift = []
+    for column in MASTER_COLUMNS[1:]:
+        if column not in stored.columns:
+            stored[column] = None
+        if column == "Latest Purchase Date":
+            left = pd.to_datetime(stored[column])
+            right = pd.to_datetime(expected[column])
+            mismatch = ~((left == right) | (left.isna() & right.isna()))
+        else:
+            left = pd.to_numeric(stored[column], errors="coerce")
+            right = pd.to_numeric(expected[column], errors="coerce")
+            mismatch = ~(np.isclose(left, right, atol=tolerance) | (left.isna() & right.isna()))
+        for product_id in all_ids[np.asarray(mismatch)]:
+            drift.append({"Product ID": int(product_id), "Column": column, "Stored": left[product_id], "Expected": right[product_id]})
+    return pd.DataFrame(drift, columns=["Product ID", "Column", "Stored", "Expected"])
@@ -0,0 +1,93 @@
+import pandas as pd
+
+# One index per table role ("product_details", "master_data"), rebuilt whenever
+# a different DataFrame object is passed in (i.e. the table was reloaded).
+_indexes = {}
+
+
+def normalize_name(name):
+    """Return the lookup key for a product name."""
+    return str(name).strip().lower()
+
+
+class ProductIndex:
+    """Constant-time lookups by product ID and (optionally) product name.
+
+    Maps lower-cased name -> Product ID and Product ID -> row position. When
+    a column holds duplicates the first row wins, like .iloc[0] on a filter.
+    Also keeps the highest Product ID, so a new ID needs no scan.
+    """
+
+    def __init__(self, table, name_column=None):
+        self.table = table
+        ids = table["Product ID"]  # Already int32 for schema tables (see schema.py)
+        if not pd.api.types.is_integer_dtype(ids):
+            ids = pd.to_numeric(ids, errors="coerce")
+        has_id = ids.notna().tolist()
+        ids = ids.tolist()
+        self.id_to_pos = {}
+        for pos in range(len(ids) - 1, -1, -1):
+            if has_id[pos]:
+                self.id_to_pos[int(ids[pos])] = pos
+        self.max_id = max(self.id_to_pos, default=0)
+        self.name_to_id = {}
+        if name_column is not None:
+            names = table[name_column]
+            has_name = names.notna().tolist()
+            names = names.tolist()
+            for pos in range(len(names) - 1, -1, -1):
+                if has_name[pos] and has_id[pos]:
+                    self.name_to_id[normalize_name(names[pos])] = int(ids[pos])
+
+    def has_name(self, name):
+        """Check if a product with this name (case-insensitive) exists."""
+        return normalize_name(name) in self.name_to_id
+
+    def id_for_name(self, name):
+        """Return the Product ID for a name, or None."""
+        return self.name_to_id.get(normalize_name(name))
+
+    def position(self, product_id):
+        """Return the row position of a Product ID, or None."""
+        try:
+            return self.id_to_pos.get(int(product_id))
+        except (TypeError, ValueError):
+            return None
+
+    def rows_for_id(self, product_id):
+        """Return the matching row as a one-row DataFrame (empty if not found)."""
+        pos = self.position(product_id)
+        return self.table.iloc[[] if pos is None else [pos]]
+
+    def add(self, table, product_id, name=None):
+        """Register a row appended at the end of table (the new DataFrame after concat)."""
+        self.table = table
+        self.id_to_pos.setdefault(int(product_id), len(table) - 1)
+        self.max_id = max(self.max_id, int(product_id))
+        if name is not None:
+            self.name_to_id.setdefault(normalize_name(name), int(product_id))
+
+    def rename(self, product_id, old_name, new_name):
+        """Move a product from old_name to new_name."""
+        if self.name_to_id.get(normalize_name(old_name)) == int(product_id):
+            del self.name_to_id[normalize_name(old_name)]
+        self.name_to_id[normalize_name(new_name)] = int(product_id)
+
+
+def get_index(table, role, name_column=None):
+    """Return the index for table, building it only if the table object changed."""
+    index = _indexes.get(role)
+    if index is None or index.table is not table:
+        index = ProductIndex(table, name_column)
+        _indexes[role] = index
+    return index
+
+
+def product_details_index(product_details):
+    """Index over product_details by name and ID."""
+    return get_index(product_details, "product_details", "Product Name")
+
+
+def master_data_index(master_data):
+    """Index over master_data by ID."""
+    return get_index(master_data, "master_data")
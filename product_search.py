@@ -0,0 +1,202 @@
+import array
+import bisect
+import heapq
+import threading
+import numpy as np
+import pandas as pd
+from product_index import normalize_name
+
+# Ranking tiers: whole-name prefix beats word prefix beats trigram similarity
+FULL_PREFIX_SCORE = 3.0
+WORD_PREFIX_SCORE = 2.0
+MIN_TRIGRAM_SCORE = 0.25
+
+_search_index = None
+
+
+def trigrams(text):
+    """Return the set of character trigrams of text, padded so short words still count."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SortedKeys:
+    """Name keys in sorted order next to their product IDs.
+
+    All keys with a prefix sit in one run that a binary search finds, and
+    come out in key order, so no per-prefix ID sets are kept.
+    """
+
+    def __init__(self, pairs=()):
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.ids = [product_id for _, product_id in pairs]
+
+    def insert(self, key, product_id):
+        pos = bisect.bisect_right(self.keys, key)
+        self.keys.insert(pos, key)
+        self.ids.insert(pos, product_id)
+
+    def remove(self, key, product_id):
+        pos = bisect.bisect_left(self.keys, key)
+        while pos < len(self.keys) and self.keys[pos] == key:
+            if self.ids[pos] == product_id:
+                del self.keys[pos]
+                del self.ids[pos]
+                return
+            pos += 1
+
+    def with_prefix(self, prefix):
+        """Yield (key, product_id) for every key starting with prefix, in key order."""
+        pos = bisect.bisect_left(self.keys, prefix)
+        while pos < len(self.keys) and self.keys[pos].startswith(prefix):
+            yield self.keys[pos], self.ids[pos]
+            pos += 1
+
+
+class ProductSearchIndex:
+    """Typeahead search over product names using sorted name keys and a trigram index.
+
+    Whole names and each word within a name are kept sorted, so "ghee" finds
+    "pure ghee" by prefix. Misspellings fall through to trigram similarity,
+    counted with NumPy over flat per-trigram ID arrays. Searches and updates
+    can come from different threads (service workers, Streamlit sessions), so
+    they take turns on a lock.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.trigram_ids = {}
+        self._lock = threading.RLock()
+        ids = pd.to_numeric(table["Product ID"], errors="coerce").tolist()
+        entries = [
+            (int(product_id), normalize_name(name)) for name, product_id in zip(table["Product Name"].tolist(), ids)
+            if not pd.isna(name) and not pd.isna(product_id)
+        ]
+        self.names = dict(entries)
+        self.name_keys = SortedKeys((key, product_id) for product_id, key in entries)
+        self.word_keys = SortedKeys((word, product_id) for product_id, key in entries for word in set(key.split()))
+        self._build_trigrams(entries)
+
+    def _build_trigrams(self, entries):
+        """Fill the trigram postings and per-product trigram counts for every product at once."""
+        postings = {}
+        counts = {}
+        for product_id, key in entries:
+            grams = trigrams(key)
+            counts[product_id] = len(grams)
+            for gram in grams:
+                ids = postings.get(gram)
+                if ids is None:
+                    ids = postings[gram] = []
+                ids.append(product_id)
+        self.trigram_ids = {gram: array.array("i", ids) for gram, ids in postings.items()}
+        self.gram_counts = np.zeros(max(counts, default=-1) + 1, dtype=np.intc)
+        self.gram_counts[list(counts)] = list(counts.values())
+
+    def _add_trigrams(self, product_id, key):
+        grams = trigrams(key)
+        if product_id >= len(self.gram_counts):
+            self.gram_counts = np.concatenate([self.gram_counts, np.zeros(product_id + 1 - len(self.gram_counts) + 1024, dtype=np.intc)])
+        self.gram_counts[product_id] = len(grams)
+        for gram in grams:
+            postings = self.trigram_ids.get(gram)
+            if postings is None:
+                postings = self.trigram_ids[gram] = array.array("i")
+            postings.append(product_id)
+
+    def add(self, table, product_id, name):
+        """Index a new product; table is the DataFrame that now holds it."""
+        key = normalize_name(name)
+        with self._lock:
+            self.table = table
+            self.names[product_id] = key
+            self.name_keys.insert(key, product_id)
+            for word in set(key.split()):
+                self.word_keys.insert(word, product_id)
+            self._add_trigrams(product_id, key)
+
+    def remove(self, product_id):
+        """Drop a product from the index."""
+        with self._lock:
+            key = self.names.pop(product_id, None)
+            if key is None:
+                return
+            self.name_keys.remove(key, product_id)
+            for word in set(key.split()):
+                self.word_keys.remove(word, product_id)
+            for gram in trigrams(key):
+                postings = self.trigram_ids.get(gram)
+                if postings is not None and product_id in postings:
+                    postings.remove(product_id)
+
+    def rename(self, product_id, new_name):
+        """Re-index a renamed product."""
+        with self._lock:
+            self.remove(product_id)
+            self.add(self.table, product_id, new_name)
+
+    def search(self, query, limit=10):
+        """Return up to limit (product_id, name, score) tuples, best match first.
+
+        Each tier is only searched if the better ones left room, and only the
+        top limit of a tier are ranked.
+        """
+        query = normalize_name(query)
+        if not query or limit <= 0:
+            return []
+        with self._lock:
+            return self._search(query, limit)
+
+    def _search(self, query, limit):
+        # Whole-name prefix matches already come out in name order
+        results = []
+        for key, product_id in self.name_keys.with_prefix(query):
+            if len(results) == limit:
+                return results
+            results.append((product_id, key, FULL_PREFIX_SCORE))
+        found = {product_id for product_id, _, _ in results}
+
+        word_ids = {product_id for _, product_id in self.word_keys.with_prefix(query)} - found
+        best = heapq.nsmallest(limit - len(results), word_ids, key=lambda product_id: (self.names[product_id], product_id))
+        results += [(product_id, self.names[product_id], WORD_PREFIX_SCORE) for product_id in best]
+        if len(results) == limit or len(query) < 3:
+            return results
+        found |= word_ids
+
+        query_grams = trigrams(query)
+        # Copies, not buffer views: a view would stop add() and remove() resizing the postings
+        postings = [np.array(self.trigram_ids[gram], dtype=np.intc) for gram in query_grams if self.trigram_ids.get(gram)]
+        if not postings:
+            return results
+        shared = np.bincount(np.concatenate(postings))
+        candidates = np.flatnonzero(shared)
+        shared = shared[candidates]
+        scores = shared / (len(query_grams) + self.gram_counts[candidates] - shared)  # Jaccard similarity
+        keep = scores >= MIN_TRIGRAM_SCORE
+        similar = (
+            (score, product_id) for product_id, score in zip(candidates[keep].tolist(), scores[keep].tolist())
+            if product_id not in found and product_id in self.names
+        )
+        best = heapq.nsmallest(limit - len(results), similar, key=lambda item: (-item[0], self.names[item[1]], item[1]))
+        return results + [(product_id, self.names[product_id], score) for score, product_id in best]
+
+
+def search_index_for(product_details):
+    """Return the search index for product_details, building it only if the table object changed."""
+    global _search_index
+    if _search_index is None or _search_index.table is not product_details:
+        _search_index = ProductSearchIndex(product_details)
+    return _search_index
+
+
+def product_added(old_table, new_table, product_id, name):
+    """Keep an already built index in step with add_new_product."""
+    if _search_index is not None and _search_index.table is old_table:
+        _search_index.add(new_table, int(product_id), name)
+
+
+def product_renamed(table, product_id, new_name):
+    """Keep an already built index in step with rename_product."""
+    if _search_index is not None and _search_index.table is table:
+        _search_index.rename(int(product_id), new_name)
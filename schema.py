@@ -0,0 +1,99 @@
+import os
+import sys
+import pandas as pd
+
+# Fixed column types for the product and master tables, keyed on the table's
+# file name. Tables are converted once when they are loaded, so readers can
+# rely on the types instead of coercing columns on every call.
+#   id    int32 (nullable Int32 if legacy rows have no ID)
+#   name  pandas' compact string dtype (interned Python strings on older pandas)
+#   float float64 (quantities and money)
+#   date  datetime64
+SCHEMAS = {
+    "product_details": {
+        "Product Name": "name",
+        "Product ID": "id",
+    },
+    "master_data": {
+        "Product ID": "id",
+        "Total Quantity": "float",
+        "Average Price": "float",
+        "Latest Price": "float",
+        "Highest Price": "float",
+        "Lowest Price": "float",
+        "Latest Purchase Date": "date",
+        "Purchased Quantity": "float",
+        "Purchase Cost": "float",
+    },
+}
+
+
+class SchemaError(ValueError):
+    """A table about to be saved holds values that don't fit its column types."""
+
+
+def schema_for(file_path):
+    """Return the column types for a table file, or None if the table has no schema."""
+    return SCHEMAS.get(os.path.splitext(os.path.basename(file_path))[0])
+
+
+def _conforms(series, kind):
+    """Check if a column already has the type for its kind."""
+    if kind == "id":
+        return str(series.dtype) in ("int32", "Int32")
+    if kind == "name":
+        return isinstance(series.dtype, pd.StringDtype)
+    if kind == "float":
+        return series.dtype == "float64"
+    return pd.api.types.is_datetime64_dtype(series)
+
+
+def _convert(series, kind):
+    """Convert a column to the type for its kind; values that don't parse become missing."""
+    if kind == "id":
+        values = pd.to_numeric(series, errors="coerce")
+        values = values.where(values == values.round())  # 3.5 is not an ID
+        return values.astype("Int32" if values.isna().any() else "int32")
+    if kind == "name":
+        values = series.astype("str")
+        if values.dtype == object:
+            values = values.map(lambda name: sys.intern(name) if isinstance(name, str) else name)
+        return values.where(series.notna())
+    if kind == "float":
+        return pd.to_numeric(series, errors="coerce").astype("float64")
+    return pd.to_datetime(series, errors="coerce")
+
+
+def conform(df, file_path):
+    """Give every schema column of a table its fixed type, in place, adding missing columns as empty.
+
+    Converting in place keeps the DataFrame object, so indexes built on it
+    stay valid.
+    """
+    schema = schema_for(file_path)
+    if schema is None:
+        return df
+    for column, kind in schema.items():
+        if column not in df.columns:
+            df[column] = _convert(pd.Series([None] * len(df), index=df.index, dtype=object), kind)
+        elif not _conforms(df[column], kind):
+            df[column] = _convert(df[column], kind)
+    return df
+
+
+def validate(df, file_path):
+    """Check a table before it is saved and conform it; raises SchemaError for values of the wrong type."""
+    schema = schema_for(file_path)
+    if schema is None:
+        return df
+    problems = []
+    for column, kind in schema.items():
+        if column not in df.columns or _conforms(df[column], kind):
+            continue
+        converted = _convert(df[column], kind)
+        bad = df[column].notna() & converted.isna()
+        if bad.any():
+            problems.append(f"{column} has {int(bad.sum())} invalid value(s), e.g. {df[column][bad].iloc[0]!r}")
+    if problems:
+        raise SchemaError(f"Cannot save {os.path.basename(file_path)}: " + "; ".join(problems))
+    return conform(df, file_path)
@@ -0,0 +1,349 @@
+"""Headless HTTP/JSON service for inventory operations.
+
+Lets the billing counter and barcode scanner stations post purchases and
+usage without going through the Streamlit UI:
+
+    python service.py --host 127.0.0.1 --port 8765
+
+Tables stay in memory between requests (storage's table cache), reads use
+pooled store connections, and transactions that arrive within a few
+milliseconds of each other are validated and committed as one batch.
+"""
+import argparse
+import asyncio
+import functools
+import json
+from datetime import date
+from urllib.parse import parse_qs, unquote, urlsplit
+import pandas as pd
+import batch_entry
+import inventory_core
+import lot_ledger
+import product_search
+import schema
+from master_view import MASTER_COLUMNS
+from storage import load_or_create_file
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# How long the committer waits for more transactions before writing a batch
+COMMIT_WINDOW = 0.02
+MAX_BATCH = 500
+MAX_BODY_BYTES = 1 << 20
+
+STATUS_TEXT = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 413: "Payload Too Large", 422: "Unprocessable Entity",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    """An error that maps straight to an HTTP response."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _product_details():
+    return load_or_create_file(inventory_core.PRODUCT_DETAILS_FILE, ["Product Name", "Product ID"])
+
+
+def _master_data():
+    return load_or_create_file(inventory_core.MASTER_DATA_FILE, MASTER_COLUMNS)
+
+
+def _records(df):
+    """Convert a DataFrame to JSON-ready records (dates as ISO strings, NaN as null)."""
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def _to_batch_row(transaction):
+    """Map a JSON transaction onto the batch entry layout."""
+    if not isinstance(transaction, dict):
+        raise HttpError(400, "Each transaction must be a JSON object")
+    product = transaction.get("product_id", transaction.get("product"))
+    return {
+        "Product": None if product is None else str(product),
+        "Quantity": transaction.get("quantity"),
+        "Total Cost": transaction.get("total_cost"),
+        "Date": transaction.get("date") or date.today().isoformat(),
+        batch_entry.EXPIRY_COLUMN: transaction.get("expiry_date"),
+    }
+
+
+class GroupCommitter:
+    """Collects transaction requests that arrive close together and commits them as one batch.
+
+    Each group is validated with batch_entry.validate_batch and written with a
+    single log_inventory_batch call, so the lock, journal and master_data
+    save are paid once per group instead of once per request.
+    """
+
+    def __init__(self, costing_method, window=COMMIT_WINDOW, max_batch=MAX_BATCH):
+        self.costing_method = costing_method
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+
+    async def submit(self, transactions):
+        """Queue a list of JSON transactions; resolves to (accepted, rejected) once committed."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((transactions, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.window
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                size += len(pending[-1][0])
+            try:
+                results = await loop.run_in_executor(None, self.commit, [transactions for transactions, _ in pending])
+            except Exception as e:
+                results = [e] * len(pending)
+            for (_, future), result in zip(pending, results):
+                if future.done():
+                    continue  # The client went away
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def commit(self, groups):
+        """Validate and write a list of request groups; returns (accepted, rejected) per group."""
+        results = inventory_core.validate_and_log_batch(functools.partial(self._validate, groups))
+        if any(accepted for accepted, _ in results):
+            inventory_core.copy_files()
+        return results
+
+    def _validate(self, groups, product_details, master_data):
+        """Validate every group's transactions; returns (valid rows, (accepted, rejected) per group)."""
+        results = [([], []) for _ in groups]
+        rows = [(g, i, transaction) for g, group in enumerate(groups) for i, transaction in enumerate(group)]
+        valid_frames = []
+        for usage in (False, True):
+            selected = [row for row in rows if bool(row[2].get("usage")) == usage]
+            if not selected:
+                continue
+            batch = pd.DataFrame([_to_batch_row(transaction) for _, _, transaction in selected],
+                                 columns=batch_entry.BATCH_COLUMNS + [batch_entry.EXPIRY_COLUMN])
+            ledger = None
+            if usage and self.costing_method == "FIFO":
+                ledger = lot_ledger.get_ledger(inventory_core.INVENTORY_CATALOG_STORE, legacy_file=inventory_core.INVENTORY_CATALOG_FILE)
+            transactions, rejected = batch_entry.validate_batch(batch, product_details, master_data, usage=usage, ledger=ledger)
+            for pos, error in rejected["Error"].items():
+                g, i, _ = selected[pos]
+                results[g][1].append({"index": i, "error": error})
+            # validate_batch keeps the valid rows in their original order
+            accepted = [selected[pos] for pos in batch.index.difference(rejected.index)]
+            for (g, i, _), record in zip(accepted, _records(transactions)):
+                results[g][0].append(dict(record, index=i))
+            valid_frames.append(transactions)
+        valid = pd.concat(valid_frames, ignore_index=True) if valid_frames else pd.DataFrame()
+        return valid, results
+
+
+class InventoryService:
+    """Routes HTTP requests to the inventory_core operations."""
+
+    def __init__(self, costing_method):
+        self.committer = GroupCommitter(costing_method)
+
+    async def dispatch(self, method, target, body):
+        """Handle one request; returns (status, payload)."""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        data = {}
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise HttpError(400, "Request body is not valid JSON")
+        loop = asyncio.get_running_loop()
+
+        if parts == ["health"] and method == "GET":
+            return 200, {"status": "ok", "queued_transactions": self.committer.queue.qsize()}
+        if parts == ["products"] and method == "GET":
+            return 200, await loop.run_in_executor(None, self.search_products, query)
+        if parts == ["products"] and method == "POST":
+            return 201, await loop.run_in_executor(None, self.add_product, data)
+        if len(parts) == 2 and parts[0] == "products" and method == "GET":
+            return 200, await loop.run_in_executor(None, self.get_product, parts[1])
+        if len(parts) == 3 and parts[0] == "products" and parts[2] == "rename" and method == "POST":
+            return 200, await loop.run_in_executor(None, self.rename_product, parts[1], data)
+        if parts == ["transactions"] and method == "POST":
+            _to_batch_row(data)  # Reject malformed bodies before they join a group
+            accepted, rejected = await self.committer.submit([data])
+            if rejected:
+                raise HttpError(422, rejected[0]["error"])
+            return 201, accepted[0]
+        if parts == ["transactions", "batch"] and method == "POST":
+            transactions = data.get("transactions") if isinstance(data, dict) else data
+            if not isinstance(transactions, list):
+                raise HttpError(400, "Expected a list of transactions")
+            for transaction in transactions:
+                _to_batch_row(transaction)
+            if not transactions:
+                return 200, {"accepted": [], "rejected": []}
+            accepted, rejected = await self.committer.submit(transactions)
+            return 200, {"accepted": accepted, "rejected": rejected}
+        if parts and parts[0] in ("health", "products", "transactions"):
+            raise HttpError(405, f"{method} is not supported on {url.path}")
+        raise HttpError(404, f"No route for {url.path}")
+
+    def search_products(self, query):
+        """Typeahead search on product names (?q=...&limit=...)."""
+        text = query.get("q", "")
+        try:
+            limit = int(query.get("limit", 10))
+        except ValueError:
+            raise HttpError(400, "limit must be a number")
+        matches = product_search.search_index_for(_product_details()).search(text, limit) if text else []
+        return {"matches": [
+            {"Product ID": int(product_id), "Product Name": name, "Score": score} for product_id, name, score in matches
+        ]}
+
+    def get_product(self, product_id):
+        """Return a product's details and its master_data row."""
+        try:
+            product_id = int(product_id)
+        except ValueError:
+            raise HttpError(400, "Product ID must be a number")
+        details = inventory_core.search_product_in_details(product_id, "Product ID", _product_details())
+        if details.empty:
+            raise HttpError(404, f"Product {product_id} not found")
+        master = inventory_core.search_product_in_master(product_id, "Product ID", _master_data())
+        return {
+            "product": _records(details)[0],
+            "stock": _records(master)[0] if not master.empty else None,
+        }
+
+    def add_product(self, data):
+        """Create a product from {"name": ...}."""
+        name = str(data.get("name", "")) if isinstance(data, dict) else ""
+        if inventory_core.validate_product_name(name, _product_details()) == "empty":
+            raise HttpError(400, "Product name cannot be empty")
+        try:
+            product_id = inventory_core.add_new_product(name)
+        except schema.SchemaError:
+            raise
+        except ValueError as e:
+            raise HttpError(409, str(e))
+        inventory_core.copy_files()
+        return {"Product ID": product_id, "Product Name": name.strip().lower()}
+
+    def rename_product(self, product_id, data):
+        """Rename a product from {"name": ...}."""
+        name = str(data.get("name", "")) if isinstance(data, dict) else ""
+        if not name.strip():
+            raise HttpError(400, "Product name cannot be empty")
+        try:
+            product_id = int(product_id)
+        except ValueError:
+            raise HttpError(400, "Product ID must be a number")
+        result = inventory_core.rename_product(product_id, name)
+        if result == "Product not found":
+            raise HttpError(404, result)
+        if result == "Product name already exists":
+            raise HttpError(409, result)
+        inventory_core.copy_files()
+        return {"Product ID": product_id, "Product Name": name.strip().lower()}
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, default=str).encode()
+    headers = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        "Connection: " + ("keep-alive" if keep_alive else "close"),
+    ]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+
+
+async def handle_connection(service, reader, writer):
+    """Serve HTTP/1.1 requests on one connection until the client closes it."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, target, version = request_line.decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                writer.write(_response(413, {"error": "Request body too large"}, keep_alive=False))
+                await writer.drain()
+                break
+            body = await reader.readexactly(length) if length else b""
+            try:
+                status, payload = await service.dispatch(method.upper(), target, body)
+            except HttpError as e:
+                status, payload = e.status, {"error": str(e)}
+            except schema.SchemaError as e:
+                status, payload = 422, {"error": str(e)}
+            except TimeoutError as e:
+                status, payload = 503, {"error": str(e)}  # Another terminal held the write lock too long
+            except Exception as e:
+                status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass  # Malformed request or dropped connection
+    finally:
+        writer.close()
+
+
+async def serve(host, port, costing_method):
+    """Recover any interrupted write, then serve until cancelled."""
+    if inventory_core.recover_interrupted_writes():
+        inventory_core.copy_files()
+    service = InventoryService(costing_method)
+    committer = asyncio.create_task(service.committer.run())
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f"Inventory service listening on http://{host}:{port} ({costing_method} costing for usage)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        committer.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the inventory HTTP/JSON service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--costing", choices=lot_ledger.COSTING_METHODS, default=lot_ledger.default_costing_method(),
+                        help="How usage posted to the service is costed")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.costing))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import argparse
+import os
+import sqlite3
+import threading
+import uuid
+import pandas as pd
+import schema
+import transaction_store
+from write_coordinator import atomic_write
+from instrumentation import timed
+
+# Backend used when INVENTORY_STORAGE_BACKEND is not set
+DEFAULT_BACKEND = "excel"
+
+# Columns holding dates, restored on backends that store them as text
+DATE_COLUMNS = ["Purchase Date", "Latest Purchase Date", "Timestamp"]
+
+# Workbooks converted by the migrate command
+TABLE_FILES = ["product_details.xlsx", "master_data.xlsx"]
+CATALOG_FILE = "inventory_catalog.xlsx"
+
+
+class StorageBackend:
+    """Shared interface for the table storage backends.
+
+    Tables are always addressed by their original xlsx path; each backend maps
+    that path to its own on-disk location.
+    """
+    name = None
+
+    def path_for(self, file_path):
+        """Return the on-disk location this backend uses for file_path."""
+        raise NotImplementedError
+
+    def exists(self, file_path):
+        """Check if the table for file_path has been stored."""
+        return os.path.exists(self.path_for(file_path))
+
+    def signature(self, file_path):
+        """Return a value that changes whenever the table for file_path is rewritten, or None if it isn't stored."""
+        try:
+            stat = os.stat(self.path_for(file_path))
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def read(self, file_path):
+        """Read the table for file_path into a DataFrame."""
+        raise NotImplementedError
+
+    def write(self, file_path, df):
+        """Replace the table for file_path with df."""
+        raise NotImplementedError
+
+
+class ExcelBackend(StorageBackend):
+    """Original xlsx workbooks, kept for compatibility."""
+    name = "excel"
+
+    def path_for(self, file_path):
+        return file_path
+
+    def read(self, file_path):
+        return pd.read_excel(file_path)
+
+    def write(self, file_path, df):
+        def write_workbook(temp_path):
+            with pd.ExcelWriter(temp_path, engine='xlsxwriter') as writer:
+                df.to_excel(writer, index=False)
+        atomic_write(file_path, write_workbook)
+
+
+class ParquetBackend(StorageBackend):
+    """Columnar Parquet files next to the workbooks; no parsing on load."""
+    name = "parquet"
+    extension = ".parquet"
+
+    def path_for(self, file_path):
+        return os.path.splitext(file_path)[0] + self.extension
+
+    def read(self, file_path):
+        return pd.read_parquet(self.path_for(file_path))
+
+    def write(self, file_path, df):
+        table = _mixed_to_str(df)
+        atomic_write(self.path_for(file_path), lambda temp_path: table.to_parquet(temp_path, index=False))
+
+
+class FeatherBackend(ParquetBackend):
+    """Feather (Arrow IPC) files; the fastest to load, larger on disk."""
+    name = "feather"
+    extension = ".feather"
+
+    def read(self, file_path):
+        return pd.read_feather(self.path_for(file_path))
+
+    def write(self, file_path, df):
+        table = _mixed_to_str(df).reset_index(drop=True)
+        atomic_write(self.path_for(file_path), table.to_feather)
+
+
+class SqliteBackend(StorageBackend):
+    """One SQLite database per data folder holding every table.
+
+    Tables share the database file, so each write also records a new version
+    for its table in table_versions; that, not the file, tells a table's
+    cache entry it is stale.
+    """
+    name = "sqlite"
+    database_name = "inventory_tables.db"
+
+    def __init__(self):
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, file_path):
+        return os.path.join(os.path.dirname(file_path), self.database_name)
+
+    def _table_name(self, file_path):
+        return os.path.splitext(os.path.basename(file_path))[0]
+
+    def _connect(self, file_path):
+        db_path = self.path_for(file_path)
+        if db_path not in self._connections:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._connections[db_path] = sqlite3.connect(db_path, check_same_thread=False)
+        return self._connections[db_path]
+
+    def exists(self, file_path):
+        if not os.path.exists(self.path_for(file_path)):
+            return False
+        with self._lock:
+            row = self._connect(file_path).execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (self._table_name(file_path),),
+            ).fetchone()
+        return row is not None
+
+    def signature(self, file_path):
+        if not os.path.exists(self.path_for(file_path)):
+            return None
+        with self._lock:
+            conn = self._connect(file_path)
+            try:
+                row = conn.execute("SELECT version FROM table_versions WHERE name = ?", (self._table_name(file_path),)).fetchone()
+            except sqlite3.OperationalError:
+                row = None  # Written before versions were recorded
+        return row[0] if row else super().signature(file_path)
+
+    def read(self, file_path):
+        with self._lock:
+            df = pd.read_sql_query(f'SELECT * FROM "{self._table_name(file_path)}"', self._connect(file_path))
+        for column in DATE_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column])
+        return df
+
+    def write(self, file_path, df):
+        # Load into a staging table, then swap it in within one transaction
+        table_name = self._table_name(file_path)
+        staging_name = f"{table_name}__staging"
+        # Date columns can hold Timestamp objects, which sqlite3 cannot bind
+        df = df.assign(**{column: pd.to_datetime(df[column]) for column in DATE_COLUMNS if column in df.columns})
+        with self._lock:
+            conn = self._connect(file_path)
+            df.to_sql(staging_name, conn, if_exists="replace", index=False)
+            conn.commit()
+            conn.execute("BEGIN")
+            try:
+                conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+                conn.execute(f'ALTER TABLE "{staging_name}" RENAME TO "{table_name}"')
+                conn.execute("CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version TEXT NOT NULL)")
+                conn.execute(
+                    "INSERT OR REPLACE INTO table_versions (name, version) VALUES (?, ?)",
+                    (table_name, uuid.uuid4().hex),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+
+BACKENDS = {
+    backend.name: backend for backend in [ExcelBackend, ParquetBackend, FeatherBackend, SqliteBackend]
+}
+_instances = {}
+
+# Tables loaded in this process, keyed on file path: (backend name, table signature, DataFrame).
+# The module outlives Streamlit reruns, so a table is parsed once and then reused
+# until the file changes on disk.
+_table_cache = {}
+
+
+def _mixed_to_str(df):
+    """Arrow needs one type per column; stringify object columns that mix types."""
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object and df[column].dropna().map(type).nunique() > 1:
+            df[column] = df[column].astype(str)
+    return df
+
+
+def get_backend(name=None):
+    """Return the backend called name, or the one selected by INVENTORY_STORAGE_BACKEND."""
+    name = (name or os.environ.get("INVENTORY_STORAGE_BACKEND") or DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
+
+
+def _signature(backend, file_path):
+    """Return the backend's change signature for a table, used to detect changes on disk."""
+    return backend.signature(file_path)
+
+
+def invalidate(file_path=None):
+    """Drop one table (or every table) from the in-process cache."""
+    if file_path is None:
+        _table_cache.clear()
+    else:
+        _table_cache.pop(file_path, None)
+
+
+@timed()
+def load_or_create_file(file_path, columns):
+    """Load a table or create one with specified columns if it doesn't exist.
+
+    The returned DataFrame is shared through the table cache; callers that
+    modify it must save it with save_to_file.
+    """
+    backend = get_backend()
+    cached = _table_cache.get(file_path)
+    if cached is not None and cached[0] == backend.name and cached[1] == _signature(backend, file_path):
+        df = cached[2]
+    elif backend.exists(file_path):
+        df = schema.conform(backend.read(file_path), file_path)  # Typed once per load, not per call
+        _table_cache[file_path] = (backend.name, _signature(backend, file_path), df)
+    else:
+        df = schema.conform(pd.DataFrame(columns=columns), file_path)
+        save_to_file(file_path, df)  # Save empty DataFrame if file doesn't exist
+        return df
+    for column in columns:  # Tables without a schema
+        if column not in df.columns:
+            df[column] = None
+    return df
+
+
+@timed()
+def save_to_file(file_path, df):
+    """Save the DataFrame for the specified file path and refresh its cache entry.
+
+    Tables with a schema are checked first and converted to their column
+    types in place; schema.SchemaError is raised if a value doesn't fit.
+    """
+    schema.validate(df, file_path)
+    backend = get_backend()
+    backend.write(file_path, df)
+    _table_cache[file_path] = (backend.name, _signature(backend, file_path), df)
+
+
+def migrate(data_dir, target):
+    """Convert the existing workbooks in data_dir to the target backend."""
+    source = get_backend("excel")
+    destination = get_backend(target)
+    for file_name in TABLE_FILES:
+        file_path = os.path.join(data_dir, file_name)
+        if not os.path.exists(file_path):
+            print(f"{file_name} does not exist in {data_dir}, skipping.")
+            continue
+        df = source.read(file_path)
+        destination.write(file_path, df)
+        print(f"Converted {file_name} ({len(df)} rows) to {destination.path_for(file_path)}.")
+
+    # The catalog always lives in the append-only transaction store
+    catalog_file = os.path.join(data_dir, CATALOG_FILE)
+    store_path = transaction_store.store_path_for(catalog_file)
+    if os.path.exists(catalog_file):
+        # Does nothing if the store already recorded the import
+        transaction_store.get_connection(store_path, legacy_file=catalog_file)
+        print(f"{CATALOG_FILE} is imported into {store_path}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inventory storage tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Convert the xlsx workbooks to another backend")
+    migrate_parser.add_argument("data_dir", help="Folder holding product_details.xlsx, master_data.xlsx and inventory_catalog.xlsx")
+    migrate_parser.add_argument("--to", dest="target", required=True, choices=[name for name in BACKENDS if name != "excel"])
+    args = parser.parse_args()
+    if args.command == "migrate":
+        migrate(args.data_dir, args.target)
+
+
+if __name__ == "__main__":
+    main()
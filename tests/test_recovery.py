@@ -0,0 +1,138 @@
+"""Crash recovery: the write journal, its replay and snapshot restore.
+
+Each test runs against a fresh data folder. A crash is simulated by making a
+step of the write raise, which leaves the journal entry behind just as a
+terminal that died at that point would.
+"""
+import os
+from datetime import date, timedelta
+import pytest
+import backup
+import inventory_core
+import master_view
+import storage
+import transaction_store
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    inventory_core.configure(str(tmp_path), "")
+    yield tmp_path
+    storage.invalidate()
+
+
+def _master_data():
+    return storage.load_or_create_file(inventory_core.MASTER_DATA_FILE, master_view.MASTER_COLUMNS)
+
+
+def _catalog():
+    return transaction_store.load_transactions(inventory_core.INVENTORY_CATALOG_STORE)
+
+
+def _stock(product_id):
+    master_data = _master_data()
+    return float(master_data.loc[master_data["Product ID"] == product_id, "Total Quantity"].iloc[0])
+
+
+def _assert_consistent():
+    drift = master_view.check_consistency(_master_data(), _catalog())
+    assert drift.empty, drift
+
+
+def _with_product(quantity=10, total_cost=100):
+    product_id = inventory_core.add_new_product("ghee")
+    inventory_core.log_inventory_transaction(product_id, quantity, total_cost, date(2024, 6, 1))
+    return product_id
+
+
+def test_crash_after_store_append(data_dir, monkeypatch):
+    product_id = _with_product()
+
+    def crash(file_path, df):
+        raise RuntimeError("terminal died")
+
+    monkeypatch.setattr(inventory_core, "save_to_file", crash)
+    with pytest.raises(RuntimeError):
+        inventory_core.log_inventory_transaction(product_id, 5, 60, date(2024, 6, 2))
+    monkeypatch.undo()
+    storage.invalidate()  # A restarted terminal starts without the half-updated cached table
+
+    assert inventory_core.coordinator.pending()
+    assert len(_catalog()) == 2
+    assert _stock(product_id) == 10  # master_data never saw the second purchase
+
+    assert inventory_core.recover_interrupted_writes()
+    assert not inventory_core.coordinator.pending()
+    assert len(_catalog()) == 2
+    assert _stock(product_id) == 15
+    _assert_consistent()
+
+
+def test_crash_after_master_data_save(data_dir, monkeypatch):
+    product_id = _with_product()
+    save_to_file = inventory_core.save_to_file
+
+    def save_then_crash(file_path, df):
+        save_to_file(file_path, df)
+        raise RuntimeError("terminal died")
+
+    monkeypatch.setattr(inventory_core, "save_to_file", save_then_crash)
+    with pytest.raises(RuntimeError):
+        inventory_core.log_inventory_transaction(product_id, -4, -40, date(2024, 6, 2))
+    monkeypatch.undo()
+    storage.invalidate()
+
+    assert inventory_core.coordinator.pending()
+    assert inventory_core.recover_interrupted_writes()
+    # The replay must not append the row a second time
+    assert len(_catalog()) == 2
+    assert _stock(product_id) == 6
+    _assert_consistent()
+
+
+def test_recovery_skipped_while_a_write_holds_the_lock(data_dir):
+    _with_product()
+    with inventory_core.coordinator.locked(), inventory_core.coordinator.journal("rebuild_master_data", {}):
+        assert not inventory_core.recover_interrupted_writes()
+        assert inventory_core.coordinator.pending()
+    assert not inventory_core.coordinator.pending()
+
+
+def test_failed_replay_is_moved_aside(data_dir):
+    _with_product()
+    with open(inventory_core.coordinator.journal_path, "w") as f:
+        f.write("not json")
+
+    failures = []
+    assert not inventory_core.recover_interrupted_writes(on_failure=failures.append)
+    assert len(failures) == 1
+    assert not inventory_core.coordinator.pending()
+    assert any(name.endswith(".failed") for name in os.listdir(inventory_core.coordinator.folder))
+    # The next start goes through cleanly
+    assert not inventory_core.recover_interrupted_writes(on_failure=failures.append)
+    assert len(failures) == 1
+
+
+def test_restore_snapshot(data_dir):
+    product_id = _with_product()
+    mirrors = [inventory_core.backup_folder, inventory_core.backup_2_folder]
+
+    def back_up(interval):
+        backup.run_backup(inventory_core.files_to_copy(), mirrors, inventory_core.snapshot_folder,
+                          inventory_core.SNAPSHOT_RETENTION, append_only=[inventory_core.INVENTORY_CATALOG_STORE],
+                          snapshot_interval=interval)
+
+    back_up(timedelta(0))
+    (snapshot,) = backup.list_snapshots(inventory_core.snapshot_folder)
+    inventory_core.log_inventory_transaction(product_id, 5, 60, date(2024, 6, 2))
+    back_up(timedelta(hours=1))  # Mirrors only; the snapshot isn't due yet
+    assert backup.list_snapshots(inventory_core.snapshot_folder) == [snapshot]
+    assert len(_catalog()) == 2
+
+    with inventory_core.all_locked():
+        backup.restore_snapshot(inventory_core.snapshot_folder, snapshot, inventory_core.files_to_copy(),
+                                inventory_core.backup_folder)
+    storage.invalidate()
+    assert len(_catalog()) == 1
+    assert _stock(product_id) == 10
+    _assert_consistent()
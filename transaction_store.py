@@ -0,0 +1,423 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from instrumentation import timed
+from write_coordinator import atomic_write
+
+# Column layout of the inventory catalog workbook, kept for exports
+CATALOG_COLUMNS = ["Product ID", "Quantity Added", "Total Cost", "Purchase Date", "Timestamp"]
+
+# Rollup tables maintained alongside the log: name -> SQL expression for the period key
+ROLLUPS = {
+    "rollup_daily": "purchase_date",
+    "rollup_monthly": "substr(purchase_date, 1, 7)",
+}
+ROLLUP_COLUMNS = ["Product ID", "Period", "Quantity In", "Quantity Out", "Spend", "Usage Cost"]
+
+# Idle read-only connections kept per store so concurrent readers don't queue
+# behind the single writer connection
+READER_POOL_SIZE = 4
+
+_connections = {}
+_reader_pools = {}
+_imported = set()
+_lock = threading.Lock()
+
+
+def store_path_for(catalog_file):
+    """Return the transaction store path that sits next to the catalog workbook."""
+    return os.path.splitext(catalog_file)[0] + ".db"
+
+
+def get_connection(store_path, legacy_file=None):
+    """Open (once per process) the SQLite transaction store at store_path.
+
+    Until the store records that the legacy xlsx catalog was imported, opening
+    it with legacy_file imports those rows, in the same commit as the record,
+    so a failed import is retried rather than leaving an empty store behind.
+    """
+    with _lock:
+        conn = _connections.get(store_path)
+        if conn is None:
+            os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(store_path, check_same_thread=False)
+            _create_schema(conn)
+            conn.commit()
+            _connections[store_path] = conn
+        if legacy_file and store_path not in _imported:
+            _import_legacy(conn, legacy_file)
+            _imported.add(store_path)
+    return conn
+
+
+def _create_schema(conn):
+    """Create the log, rollup and bookkeeping tables that are missing."""
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS inventory_catalog ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "product_id INTEGER NOT NULL, "
+        "quantity_added REAL NOT NULL, "
+        "total_cost REAL, "
+        "purchase_date TEXT, "
+        "timestamp TEXT)"
+    )
+    # Optional per-lot expiry, added after the first release of the store
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(inventory_catalog)")]
+    if "expiry_date" not in columns:
+        conn.execute("ALTER TABLE inventory_catalog ADD COLUMN expiry_date TEXT")
+    _create_rollups(conn)
+    has_meta = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'store_meta'").fetchone()
+    if not has_meta:
+        conn.execute("CREATE TABLE store_meta (key TEXT PRIMARY KEY, value TEXT)")
+        # Stores from before the import was recorded imported on creation; only an empty one may have failed
+        if conn.execute("SELECT 1 FROM inventory_catalog LIMIT 1").fetchone():
+            conn.execute("INSERT INTO store_meta (key, value) VALUES ('legacy_imported', 'before import tracking')")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS legacy_import_skipped ("
+        "sheet_row INTEGER NOT NULL, "
+        "error TEXT NOT NULL)"
+    )
+
+
+def _import_legacy(conn, legacy_file):
+    """Import the legacy xlsx catalog once, skipping (and recording) rows that can't be read."""
+    if conn.execute("SELECT 1 FROM store_meta WHERE key = 'legacy_imported'").fetchone():
+        return
+    rows, skipped = [], []
+    try:
+        if os.path.exists(legacy_file):
+            legacy = pd.read_excel(legacy_file)
+            # Sheet row numbers: the header is row 1
+            for sheet_row, transaction in enumerate(legacy.to_dict("records"), start=2):
+                try:
+                    rows.append(_to_row(transaction))
+                except (KeyError, TypeError, ValueError) as e:
+                    skipped.append((sheet_row, f"{type(e).__name__}: {e}"))
+        _insert_rows(conn, rows)
+        conn.executemany("INSERT INTO legacy_import_skipped (sheet_row, error) VALUES (?, ?)", skipped)
+        conn.execute("INSERT INTO store_meta (key, value) VALUES ('legacy_imported', ?)", (pd.Timestamp.now().isoformat(),))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if skipped:
+        print(f"Skipped {len(skipped)} unreadable row(s) of {legacy_file}; they are listed in legacy_import_skipped.")
+
+
+def skipped_legacy_rows(store_path):
+    """Return the legacy catalog rows that could not be imported, with the reason."""
+    with _reader(store_path) as conn:
+        df = pd.read_sql_query("SELECT sheet_row, error FROM legacy_import_skipped ORDER BY sheet_row", conn)
+    df.columns = ["Sheet Row", "Error"]
+    return df
+
+
+@contextmanager
+def _reader(store_path):
+    """Borrow a pooled connection for reading from the store.
+
+    Readers never create the store: one that doesn't exist yet reads as
+    empty, so the writer that creates it still imports the legacy catalog.
+    """
+    if store_path not in _connections and not os.path.exists(store_path):
+        conn = sqlite3.connect(":memory:")
+        try:
+            _create_schema(conn)
+            yield conn
+        finally:
+            conn.close()
+        return
+    get_connection(store_path)  # Make sure the schema is up to date
+    pool = _reader_pools.setdefault(store_path, queue.LifoQueue())
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = sqlite3.connect(store_path, check_same_thread=False)
+    try:
+        yield conn
+    finally:
+        if pool.qsize() < READER_POOL_SIZE:
+            pool.put(conn)
+        else:
+            conn.close()
+
+
+def _create_rollups(conn):
+    """Create missing rollup tables, filling them from the rows already in the log."""
+    for table, period in ROLLUPS.items():
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        if exists:
+            continue
+        conn.execute(
+            f"CREATE TABLE {table} ("
+            "product_id INTEGER NOT NULL, "
+            "period TEXT NOT NULL, "
+            "quantity_in REAL NOT NULL DEFAULT 0, "
+            "quantity_out REAL NOT NULL DEFAULT 0, "
+            "spend REAL NOT NULL DEFAULT 0, "
+            "usage_cost REAL NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (product_id, period))"
+        )
+        conn.execute(
+            f"INSERT INTO {table} (product_id, period, quantity_in, quantity_out, spend, usage_cost) "
+            f"SELECT product_id, {period}, "
+            "SUM(CASE WHEN quantity_added > 0 THEN quantity_added ELSE 0 END), "
+            "SUM(CASE WHEN quantity_added < 0 THEN -quantity_added ELSE 0 END), "
+            "SUM(CASE WHEN quantity_added > 0 THEN COALESCE(total_cost, 0) ELSE 0 END), "
+            "SUM(CASE WHEN quantity_added < 0 THEN COALESCE(total_cost, 0) ELSE 0 END) "
+            f"FROM inventory_catalog WHERE purchase_date IS NOT NULL GROUP BY product_id, {period}"
+        )
+
+
+def _rollup_row(row, period):
+    """Return the rollup increments (product, period, in, out, spend, usage cost) for a store row."""
+    product_id, quantity, total_cost = row[:3]
+    total_cost = total_cost or 0
+    if quantity > 0:
+        return (product_id, period, quantity, 0, total_cost, 0)
+    return (product_id, period, 0, -quantity, 0, total_cost)
+
+
+def _to_row(transaction):
+    """Convert a transaction dict (catalog column names) into a store row; raises ValueError for unreadable values."""
+    purchase_date = transaction.get("Purchase Date")
+    timestamp = transaction.get("Timestamp")
+    expiry_date = transaction.get("Expiry Date")
+    quantity = float(transaction["Quantity Added"])
+    if pd.isna(quantity):
+        raise ValueError("Quantity Added is missing")
+    return (
+        int(transaction["Product ID"]),
+        quantity,
+        None if pd.isna(transaction.get("Total Cost")) else float(transaction["Total Cost"]),
+        None if pd.isna(purchase_date) else pd.to_datetime(purchase_date).date().isoformat(),
+        None if pd.isna(timestamp) else pd.to_datetime(timestamp).isoformat(),
+        None if pd.isna(expiry_date) else pd.to_datetime(expiry_date).date().isoformat(),
+    )
+
+
+def to_rows(transactions):
+    """Convert transaction dicts into store rows; raises ValueError for values that can't be stored."""
+    return [_to_row(transaction) for transaction in transactions]
+
+
+def append_transaction(store_path, transaction):
+    """Append one transaction to the store. Cost does not depend on history size."""
+    append_transactions(store_path, [transaction])
+
+
+@timed()
+def append_transactions(store_path, transactions):
+    """Append several transactions in a single commit."""
+    conn = get_connection(store_path)
+    rows = to_rows(transactions)
+    with _lock:
+        _insert_rows(conn, rows)
+        conn.commit()
+
+
+def _insert_rows(conn, rows):
+    """Insert store rows and their rollup increments; the caller commits."""
+    conn.executemany(
+        "INSERT INTO inventory_catalog "
+        "(product_id, quantity_added, total_cost, purchase_date, timestamp, expiry_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    # Keep the rollups in step within the same commit
+    for table, period_length in (("rollup_daily", 10), ("rollup_monthly", 7)):
+        conn.executemany(
+            f"INSERT INTO {table} (product_id, period, quantity_in, quantity_out, spend, usage_cost) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (product_id, period) DO UPDATE SET "
+            "quantity_in = quantity_in + excluded.quantity_in, "
+            "quantity_out = quantity_out + excluded.quantity_out, "
+            "spend = spend + excluded.spend, "
+            "usage_cost = usage_cost + excluded.usage_cost",
+            [_rollup_row(row, row[3][:period_length]) for row in rows if row[3] is not None],
+        )
+
+
+def contains_transaction(store_path, transaction):
+    """Check if a transaction (matched on Product ID and Timestamp) is already stored."""
+    product_id, _, _, _, timestamp, _ = _to_row(transaction)
+    with _reader(store_path) as conn:
+        row = conn.execute(
+            "SELECT 1 FROM inventory_catalog WHERE product_id = ? AND timestamp = ? LIMIT 1",
+            (product_id, timestamp),
+        ).fetchone()
+    return row is not None
+
+
+def store_version(store_path):
+    """Return a number that changes whenever a transaction is appended."""
+    with _reader(store_path) as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM inventory_catalog").fetchone()[0]
+
+
+def load_rollup(store_path, table, product_id=None):
+    """Load a rollup table (rollup_daily or rollup_monthly), optionally for one product."""
+    if table not in ROLLUPS:
+        raise ValueError(f"Unknown rollup '{table}'")
+    query = f"SELECT product_id, period, quantity_in, quantity_out, spend, usage_cost FROM {table}"
+    params = ()
+    if product_id is not None:
+        query += " WHERE product_id = ?"
+        params = (int(product_id),)
+    with _reader(store_path) as conn:
+        df = pd.read_sql_query(query + " ORDER BY period", conn, params=params)
+    df.columns = ROLLUP_COLUMNS
+    return df
+
+
+def load_usage_window(store_path, since):
+    """Sum daily usage (and its square, for variability) per product from the daily rollup since a date."""
+    with _reader(store_path) as conn:
+        df = pd.read_sql_query(
+            "SELECT product_id, SUM(quantity_out), SUM(quantity_out * quantity_out) "
+            "FROM rollup_daily WHERE period >= ? AND quantity_out > 0 GROUP BY product_id",
+            conn,
+            params=(pd.to_datetime(since).date().isoformat(),),
+        )
+    df.columns = ["Product ID", "Quantity Out", "Quantity Out Squared"]
+    return df
+
+
+@timed()
+def load_transactions(store_path):
+    """Load the full transaction history as a DataFrame in the catalog layout."""
+    with _reader(store_path) as conn:
+        df = pd.read_sql_query(
+            "SELECT product_id, quantity_added, total_cost, purchase_date, timestamp "
+            "FROM inventory_catalog ORDER BY id",
+            conn,
+        )
+    df.columns = CATALOG_COLUMNS
+    df["Purchase Date"] = pd.to_datetime(df["Purchase Date"])
+    # isoformat() leaves out the microseconds when they are zero, so the format varies by row
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"], format="ISO8601")
+    return df
+
+
+def load_rows_since(store_path, after_id):
+    """Load the rows appended after row id after_id, with their row id and expiry date."""
+    with _reader(store_path) as conn:
+        df = pd.read_sql_query(
+            "SELECT id, product_id, quantity_added, total_cost, purchase_date, expiry_date "
+            "FROM inventory_catalog WHERE id > ? ORDER BY id",
+            conn,
+            params=(int(after_id),),
+        )
+    df.columns = ["Row ID", "Product ID", "Quantity Added", "Total Cost", "Purchase Date", "Expiry Date"]
+    return df
+
+
+def last_row_id(path):
+    """Return the id of the last row in a store file (or a copy of one), 0 if it has none."""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM inventory_catalog").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def update_copy(store_path, copy_path):
+    """Bring a backup copy of the store up to date; returns the copy's last row id.
+
+    The log is append-only, so only the rows the copy lacks are inserted,
+    along with the rollup rows they touched. A missing copy, or one that is
+    not an earlier state of the store (e.g. after a restore), is copied in
+    full instead.
+    """
+    if os.path.exists(copy_path):
+        conn = sqlite3.connect(copy_path)
+        try:
+            conn.execute("ATTACH DATABASE ? AS source", (store_path,))
+            if _append_to_copy(conn):
+                return last_row_id(copy_path)
+        finally:
+            conn.close()
+    source = sqlite3.connect(store_path)
+    destination = sqlite3.connect(copy_path)
+    try:
+        source.backup(destination)
+    finally:
+        destination.close()
+        source.close()
+    return last_row_id(copy_path)
+
+
+def _append_to_copy(conn):
+    """Insert the source store's new rows into the attached copy; returns False if the copy can't be extended."""
+    def tables(schema):
+        return {row[0] for row in conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")}
+
+    def columns(schema):
+        return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(inventory_catalog)")]
+
+    if not tables("source") <= tables("main") or columns("source") != columns("main"):
+        return False
+    last = conn.execute("SELECT id, timestamp FROM main.inventory_catalog ORDER BY id DESC LIMIT 1").fetchone()
+    after_id = last[0] if last else 0
+    if last:
+        # The copy's last row must still be in the store, unchanged
+        same = conn.execute("SELECT timestamp IS ? FROM source.inventory_catalog WHERE id = ?", (last[1], after_id)).fetchone()
+        if not same or not same[0]:
+            return False
+    column_list = ", ".join(columns("main"))
+    with conn:
+        conn.execute(
+            f"INSERT INTO main.inventory_catalog ({column_list}) "
+            f"SELECT {column_list} FROM source.inventory_catalog WHERE id > ?",
+            (after_id,),
+        )
+        for table, period in ROLLUPS.items():
+            conn.execute(
+                f"INSERT OR REPLACE INTO main.{table} SELECT r.* FROM source.{table} r "
+                f"JOIN (SELECT DISTINCT product_id, {period} AS period FROM source.inventory_catalog WHERE id > ?) k "
+                "ON r.product_id = k.product_id AND r.period = k.period",
+                (after_id,),
+            )
+        # Small bookkeeping tables are copied whole
+        for table in sorted({"store_meta", "legacy_import_skipped"} & tables("source")):
+            conn.execute(f"DELETE FROM main.{table}")
+            conn.execute(f"INSERT INTO main.{table} SELECT * FROM source.{table}")
+    return True
+
+
+def truncate_copy(copy_path, last_row_id):
+    """Drop the rows after last_row_id from a copy of the store and rebuild its rollups from the rest."""
+    conn = sqlite3.connect(copy_path)
+    try:
+        conn.execute("DELETE FROM inventory_catalog WHERE id > ?", (int(last_row_id),))
+        conn.commit()
+    finally:
+        conn.close()
+    rebuild_rollups(copy_path)
+
+
+def rebuild_rollups(path):
+    """Fill the rollup tables of a store file again from its log, e.g. after rows were bulk-loaded into it."""
+    conn = sqlite3.connect(path)
+    try:
+        for table in ROLLUPS:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        _create_rollups(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def export_to_excel(store_path, xlsx_path):
+    """Write the whole transaction history to xlsx in the original catalog layout."""
+    df = load_transactions(store_path)
+
+    def write_workbook(temp_path):
+        with pd.ExcelWriter(temp_path, engine='xlsxwriter') as writer:
+            df.to_excel(writer, index=False)
+    # The workbook is also the legacy import source, so never leave it half-written
+    atomic_write(xlsx_path, write_workbook)
+    return len(df)
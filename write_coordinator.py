@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# How long a writer waits for another terminal before giving up
+DEFAULT_LOCK_TIMEOUT = 10.0
+LOCK_POLL_INTERVAL = 0.02
+
+
+def _try_lock(f):
+    """Take a non-blocking exclusive lock on an open file; raises OSError if it is held."""
+    if os.name == "nt":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def _unlock(f):
+    if os.name == "nt":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(file_path, write):
+    """Call write(temp_path) and then rename the temp file over file_path.
+
+    Readers see either the old file or the new one, never a truncated one.
+    """
+    root, extension = os.path.splitext(file_path)
+    # Keep the extension; some writers pick their format from it
+    temp_path = f"{root}.{os.getpid()}.{threading.get_ident()}.tmp{extension}"
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)  # e.g. the first write for a new branch
+    try:
+        write(temp_path)
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class ReplayError(Exception):
+    """A leftover journal entry could not be replayed and was moved aside."""
+
+
+class WriteCoordinator:
+    """Serialises read-modify-write cycles on a shared data folder.
+
+    Writers hold an inter-process lock on <folder>/inventory.lock for the
+    whole cycle, and record what they are about to change in
+    <folder>/inventory.journal first. If a terminal dies mid-write, the next
+    one to start replays the journal entry before doing anything else.
+    """
+
+    def __init__(self, folder, lock_timeout=DEFAULT_LOCK_TIMEOUT):
+        self.folder = folder
+        self.lock_path = os.path.join(folder, "inventory.lock")
+        self.journal_path = os.path.join(folder, "inventory.journal")
+        self.lock_timeout = lock_timeout
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def locked(self, timeout=None):
+        """Hold the data folder lock (threads in this process queue on a local lock first).
+
+        Waits up to timeout seconds (default lock_timeout) and then raises
+        TimeoutError; timeout=0 only tries once.
+        """
+        if timeout is None:
+            timeout = self.lock_timeout
+        deadline = time.monotonic() + timeout
+        if not self._thread_lock.acquire(timeout=timeout):
+            raise TimeoutError("Timed out waiting for another write in this app to finish.")
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(self.lock_path, "a+b") as f:
+                while True:
+                    try:
+                        _try_lock(f)
+                        break
+                    except OSError:
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"Timed out waiting for the lock on {self.folder}; another terminal is writing.")
+                        time.sleep(LOCK_POLL_INTERVAL)
+                try:
+                    yield
+                finally:
+                    _unlock(f)
+        finally:
+            self._thread_lock.release()
+
+    @contextmanager
+    def journal(self, kind, payload):
+        """Record an intended change before applying it; the entry is cleared once it is applied.
+
+        Must be used while holding locked(). If applying raises, the entry is
+        left in place so recover() can finish the change.
+        """
+        entry = {"kind": kind, "payload": payload, "started": time.time()}
+
+        def write_entry(temp_path):
+            with open(temp_path, "w") as f:
+                json.dump(entry, f, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+
+        atomic_write(self.journal_path, write_entry)
+        yield
+        os.remove(self.journal_path)
+
+    def pending(self):
+        """Check if a half-applied change is waiting to be recovered."""
+        return os.path.exists(self.journal_path)
+
+    def recover(self, replay):
+        """Replay a leftover journal entry with replay(kind, payload).
+
+        replay must be idempotent: the crash may have happened before, during
+        or after any of the entry's writes. If it raises, the entry is moved
+        aside to inventory.journal.<time>.failed and ReplayError is raised, so
+        one bad entry doesn't block every later start.
+
+        The journal is also there while another terminal is in the middle of a
+        write, so this doesn't wait for the lock: if it is held, the writer is
+        alive and recovery is left for a later start.
+        """
+        if not self.pending():
+            return None
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(self.locked(timeout=0))
+            except TimeoutError:
+                return None  # A writer holds the lock, so the entry is its own
+            if not self.pending():
+                return None  # Another terminal recovered it first
+            try:
+                with open(self.journal_path) as f:
+                    entry = json.load(f)
+                replay(entry["kind"], entry["payload"])
+            except Exception as e:
+                failed_path = f"{self.journal_path}.{time.strftime('%Y%m%d-%H%M%S')}.failed"
+                os.replace(self.journal_path, failed_path)
+                raise ReplayError(f"Could not finish an interrupted write ({type(e).__name__}: {e}); "
+                                  f"the journal entry was moved to {failed_path}.") from e
+            os.remove(self.journal_path)
+        return entry